@@ -0,0 +1,119 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, Optional, Tuple
+import discord
+from job_queue import PRIORITY_MESSAGE
+from logger import get_logger
+
+logger = get_logger('admission')
+
+# 仍在处理中的申请状态，同一用户存在这些状态的申请时不能重复提交
+OPEN_STATUSES = ('pending', 'queued', 'processing')
+
+class AdmissionController:
+    """申请准入控制：重复申请检查、用户冷却时间和服务器每分钟审核卡片上限
+    
+    超过上限的申请以 queued 状态保存，由后台任务按上限逐步发送到审核频道。
+    """
+    
+    def __init__(self, application_store, cooldown: float = 300.0, per_minute: int = 20, drain_interval: float = 5.0):
+        self.application_store = application_store
+        self.cooldown = cooldown
+        self.per_minute = per_minute
+        self.drain_interval = drain_interval
+        self._posted: Dict[int, Deque[float]] = defaultdict(deque)
+        self._drain_task: Optional[asyncio.Task] = None
+    
+    def _window(self, guild_id: int) -> Deque[float]:
+        """返回服务器最近一分钟内发送的审核卡片时间"""
+        window = self._posted[guild_id]
+        cutoff = time.monotonic() - 60
+        while window and window[0] < cutoff:
+            window.popleft()
+        return window
+    
+    def check(self, guild_id: int, user_id: int) -> Tuple[str, Optional[float]]:
+        """检查新申请，返回 (决定, 详情)
+        
+        决定为 duplicate（已有未处理申请）、cooldown（详情为剩余秒数）、queue 或 accept。
+        """
+        latest = self.application_store.get_latest_for_user(guild_id, user_id)
+        if latest:
+            if latest['status'] in OPEN_STATUSES:
+                return 'duplicate', None
+            # 发送失败的申请不计入冷却时间
+            remaining = 0 if latest['status'] == 'failed' else latest['created_at'] + self.cooldown - time.time()
+            if remaining > 0:
+                return 'cooldown', remaining
+        
+        # 已有排队申请时新申请也要排队，保持先后顺序
+        if len(self._window(guild_id)) >= self.per_minute or self.application_store.list_queued(guild_id, 1):
+            return 'queue', None
+        return 'accept', None
+    
+    def record_post(self, guild_id: int):
+        """记录一次审核卡片发送"""
+        self._window(guild_id).append(time.monotonic())
+    
+    def queue_position(self, guild_id: int, application_id: int) -> int:
+        return self.application_store.queue_position(guild_id, application_id)
+    
+    def start(self, bot):
+        """启动排队申请的发送任务"""
+        if self._drain_task is None:
+            self._drain_task = asyncio.create_task(self._drain_loop(bot))
+    
+    async def close(self):
+        if self._drain_task is not None:
+            self._drain_task.cancel()
+            try:
+                await self._drain_task
+            except asyncio.CancelledError:
+                pass
+            self._drain_task = None
+    
+    async def _drain_loop(self, bot):
+        while True:
+            await asyncio.sleep(self.drain_interval)
+            try:
+                await self.drain(bot)
+            except Exception as e:
+                logger.error(f"发送排队申请失败: {e}")
+    
+    async def drain(self, bot):
+        """在每分钟上限内发送排队的申请"""
+        from verification_views import post_review_card
+        
+        for guild_id in self.application_store.queued_guilds():
+            # 排队超过有效期的申请直接关闭，不再发送到审核频道
+            expire_after = bot.config_manager.get_expire_after(guild_id)
+            if expire_after:
+                expired = self.application_store.expire_queued(guild_id, time.time() - expire_after)
+                if expired:
+                    logger.info(f"服务器 {guild_id} 已关闭 {expired} 个排队超过有效期的申请")
+            
+            allowed = self.per_minute - len(self._window(guild_id))
+            if allowed <= 0:
+                continue
+            
+            review_channel_id = bot.config_manager.get_review_channel_id(guild_id)
+            review_channel = bot.get_channel(review_channel_id) if review_channel_id else None
+            if not review_channel:
+                continue
+            
+            queued = self.application_store.list_queued(guild_id, allowed)
+            for application in queued:
+                self.record_post(guild_id)
+                try:
+                    await bot.job_queue.submit(
+                        'send_message',
+                        lambda application=application: post_review_card(bot.config_manager, review_channel, application),
+                        priority=PRIORITY_MESSAGE,
+                        guild_id=guild_id
+                    )
+                except discord.HTTPException as e:
+                    logger.error(f"发送排队申请 {application['id']} 失败: {e}")
+                    break
+            if queued:
+                logger.info(f"服务器 {guild_id} 已发送 {len(queued)} 个排队申请")
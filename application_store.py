@@ -0,0 +1,267 @@
+import sqlite3
+import time
+from typing import Optional, Dict, Any, List
+from audit_log import AuditLog, DECISION_STATUSES
+from logger import get_logger
+
+logger = get_logger('applications')
+
+class ApplicationStore:
+    """验证申请记录存储，按审核消息ID索引，重启后依然可用"""
+    
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS applications (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        message_id INTEGER UNIQUE,
+        channel_id INTEGER,
+        reason TEXT,
+        status TEXT NOT NULL DEFAULT 'pending',
+        account_created_at REAL,
+        joined_at REAL,
+        created_at REAL NOT NULL,
+        decided_at REAL,
+        reviewer_id INTEGER,
+        digest_message_id INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS idx_applications_guild_status ON applications (guild_id, status, created_at);
+    CREATE INDEX IF NOT EXISTS idx_applications_guild_user ON applications (guild_id, user_id, created_at);
+    CREATE INDEX IF NOT EXISTS idx_applications_status ON applications (status);
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """
+    
+    # 旧数据库中缺少的列：(列名, 类型)
+    MIGRATIONS = (
+        ('digest_message_id', 'INTEGER'),
+        ('claimed_at', 'REAL'),
+    )
+    INDEXES = (
+        'CREATE INDEX IF NOT EXISTS idx_applications_digest ON applications (digest_message_id)',
+    )
+    
+    SQL_INSERT = (
+        'INSERT INTO applications (guild_id, user_id, message_id, channel_id, reason, status, '
+        'account_created_at, joined_at, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)'
+    )
+    SQL_BY_ID = 'SELECT * FROM applications WHERE id = ?'
+    SQL_BY_MESSAGE = 'SELECT * FROM applications WHERE message_id = ?'
+    SQL_LATEST_FOR_USER = 'SELECT * FROM applications WHERE guild_id = ? AND user_id = ? ORDER BY created_at DESC LIMIT 1'
+    SQL_QUEUED_GUILDS = "SELECT DISTINCT guild_id FROM applications WHERE status = 'queued'"
+    SQL_LIST_QUEUED = "SELECT * FROM applications WHERE guild_id = ? AND status = 'queued' ORDER BY id LIMIT ?"
+    SQL_LIST_QUEUED_BEFORE = "SELECT id FROM applications WHERE guild_id = ? AND status = 'queued' AND created_at <= ?"
+    SQL_QUEUE_POSITION = "SELECT COUNT(*) FROM applications WHERE guild_id = ? AND status = 'queued' AND id <= ?"
+    SQL_UNDIGESTED_GUILDS = (
+        "SELECT guild_id, MIN(created_at), COUNT(*) FROM applications "
+        "WHERE status = 'pending' AND message_id IS NULL AND digest_message_id IS NULL GROUP BY guild_id"
+    )
+    SQL_LIST_UNDIGESTED = (
+        "SELECT * FROM applications WHERE guild_id = ? AND status = 'pending' "
+        "AND message_id IS NULL AND digest_message_id IS NULL ORDER BY id LIMIT ?"
+    )
+    SQL_SET_DIGEST = 'UPDATE applications SET channel_id = ?, digest_message_id = ? WHERE id = ?'
+    SQL_LIST_BY_DIGEST = 'SELECT * FROM applications WHERE digest_message_id = ? ORDER BY id'
+    # 发送卡片期间申请可能已被处理或过期，只有仍在排队或待审核的申请才记录审核消息
+    SQL_SET_MESSAGE = (
+        "UPDATE applications SET channel_id = ?, message_id = ?, status = 'pending' "
+        "WHERE id = ? AND status IN ('queued', 'pending')"
+    )
+    SQL_REQUEUE = "UPDATE applications SET status = 'queued' WHERE id = ? AND status = 'pending'"
+    SQL_SET_STATUS = 'UPDATE applications SET status = ?, reviewer_id = ?, decided_at = ? WHERE id = ?'
+    # 认领：只有仍为 pending 的申请才能被认领，保证多个审核者同时点击时只有一个成功
+    SQL_CLAIM = "UPDATE applications SET status = 'processing', reviewer_id = ?, claimed_at = ? WHERE id = ? AND status = 'pending'"
+    SQL_RELEASE = "UPDATE applications SET status = 'pending', reviewer_id = NULL, claimed_at = NULL WHERE id = ? AND status = 'processing'"
+    SQL_RELEASE_STALE = (
+        "UPDATE applications SET status = 'pending', reviewer_id = NULL, claimed_at = NULL "
+        "WHERE status = 'processing' AND claimed_at < ?"
+    )
+    SQL_COUNT_PENDING = "SELECT COUNT(*) FROM applications WHERE guild_id = ? AND status = 'pending'"
+    SQL_OLDEST_PENDING = "SELECT MIN(created_at) FROM applications WHERE guild_id = ? AND status = 'pending'"
+    SQL_OLDEST_PENDING_BY_GUILD = "SELECT guild_id, MIN(created_at) FROM applications WHERE status = 'pending' GROUP BY guild_id"
+    SQL_LIST_APPROVED_AFTER = (
+        "SELECT id, user_id FROM applications WHERE guild_id = ? AND status = 'approved' AND id > ? ORDER BY id LIMIT ?"
+    )
+    SQL_APPROVED_USERS = "SELECT DISTINCT user_id FROM applications WHERE guild_id = ? AND status = 'approved'"
+    SQL_GET_META = 'SELECT value FROM meta WHERE key = ?'
+    SQL_SET_META = 'INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value'
+    
+    def __init__(self, db_path: str = 'verification.db'):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, cached_statements=64)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(self.SCHEMA)
+        self._migrate()
+        
+        # 进程中断时未完成的认领重新开放审核
+        released = self.release_stale_claims()
+        if released:
+            logger.info(f"已重新开放 {released} 个未完成处理的申请")
+        
+        # 审核历史与统计汇总
+        self.audit = AuditLog(self.conn)
+        self.audit.backfill()
+    
+    def _migrate(self):
+        """为旧数据库补充新增的列和索引"""
+        columns = {row['name'] for row in self.conn.execute('PRAGMA table_info(applications)')}
+        with self.conn:
+            for name, column_type in self.MIGRATIONS:
+                if name not in columns:
+                    self.conn.execute(f'ALTER TABLE applications ADD COLUMN {name} {column_type}')
+            for statement in self.INDEXES:
+                self.conn.execute(statement)
+    
+    def create(self, guild_id: int, user_id: int, reason: str, account_created_at: Optional[float] = None,
+               joined_at: Optional[float] = None, message_id: Optional[int] = None,
+               channel_id: Optional[int] = None, status: str = 'pending') -> int:
+        """创建申请记录，返回记录ID"""
+        with self.conn:
+            cursor = self.conn.execute(self.SQL_INSERT, (
+                guild_id, user_id, message_id, channel_id, reason, status,
+                account_created_at, joined_at, time.time()
+            ))
+        return cursor.lastrowid
+    
+    def get(self, application_id: int) -> Optional[Dict[str, Any]]:
+        """按记录ID获取申请"""
+        row = self.conn.execute(self.SQL_BY_ID, (application_id,)).fetchone()
+        return dict(row) if row else None
+    
+    def get_by_message(self, message_id: int) -> Optional[Dict[str, Any]]:
+        """按审核消息ID获取申请"""
+        row = self.conn.execute(self.SQL_BY_MESSAGE, (message_id,)).fetchone()
+        return dict(row) if row else None
+    
+    def get_latest_for_user(self, guild_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+        """获取用户在服务器中最近一次申请"""
+        row = self.conn.execute(self.SQL_LATEST_FOR_USER, (guild_id, user_id)).fetchone()
+        return dict(row) if row else None
+    
+    def queued_guilds(self) -> List[int]:
+        """有排队申请的服务器"""
+        return [row[0] for row in self.conn.execute(self.SQL_QUEUED_GUILDS)]
+    
+    def list_queued(self, guild_id: int, limit: int) -> List[Dict[str, Any]]:
+        """按排队顺序列出服务器中排队的申请"""
+        return [dict(row) for row in self.conn.execute(self.SQL_LIST_QUEUED, (guild_id, limit))]
+    
+    def expire_queued(self, guild_id: int, submitted_before: float) -> int:
+        """关闭服务器中 submitted_before 之前提交、仍在排队的申请，返回关闭的数量"""
+        now = time.time()
+        with self.conn:
+            ids = [row[0] for row in self.conn.execute(self.SQL_LIST_QUEUED_BEFORE, (guild_id, submitted_before))]
+            for application_id in ids:
+                self.conn.execute(self.SQL_SET_STATUS, ('expired', None, now, application_id))
+                self.audit.record(application_id, 'expired', None, now)
+        return len(ids)
+    
+    def queue_position(self, guild_id: int, application_id: int) -> int:
+        """申请在服务器队列中的位置（从 1 开始）"""
+        return self.conn.execute(self.SQL_QUEUE_POSITION, (guild_id, application_id)).fetchone()[0]
+    
+    def undigested_guilds(self) -> List[tuple]:
+        """有待汇总申请的服务器，返回 (服务器ID, 最早提交时间, 数量)"""
+        return [tuple(row) for row in self.conn.execute(self.SQL_UNDIGESTED_GUILDS)]
+    
+    def list_undigested(self, guild_id: int, limit: int) -> List[Dict[str, Any]]:
+        """列出尚未放入汇总消息的待审核申请"""
+        return [dict(row) for row in self.conn.execute(self.SQL_LIST_UNDIGESTED, (guild_id, limit))]
+    
+    def set_digest(self, application_ids: List[int], channel_id: int, message_id: int):
+        """记录申请所在的汇总消息"""
+        with self.conn:
+            self.conn.executemany(self.SQL_SET_DIGEST, [(channel_id, message_id, application_id) for application_id in application_ids])
+    
+    def list_by_digest(self, message_id: int) -> List[Dict[str, Any]]:
+        """列出汇总消息中的全部申请"""
+        return [dict(row) for row in self.conn.execute(self.SQL_LIST_BY_DIGEST, (message_id,))]
+    
+    def list_pending(self, guild_id: int, submitted_before: Optional[float] = None,
+                     account_created_before: Optional[float] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """按条件列出待审核的申请，按提交时间从早到晚排序"""
+        sql = "SELECT * FROM applications WHERE guild_id = ? AND status = 'pending'"
+        params: list = [guild_id]
+        if submitted_before is not None:
+            sql += ' AND created_at <= ?'
+            params.append(submitted_before)
+        if account_created_before is not None:
+            sql += ' AND account_created_at <= ?'
+            params.append(account_created_before)
+        sql += ' ORDER BY created_at LIMIT ?'
+        params.append(limit)
+        return [dict(row) for row in self.conn.execute(sql, params)]
+    
+    def set_message(self, application_id: int, channel_id: int, message_id: int) -> bool:
+        """记录申请对应的审核消息，申请进入待审核状态；申请已不在排队或待审核状态时返回 False"""
+        with self.conn:
+            cursor = self.conn.execute(self.SQL_SET_MESSAGE, (channel_id, message_id, application_id))
+        return cursor.rowcount == 1
+    
+    def set_status(self, application_id: int, status: str, reviewer_id: Optional[int] = None):
+        """更新申请状态；最终决定同时写入审核历史"""
+        now = time.time()
+        with self.conn:
+            self.conn.execute(self.SQL_SET_STATUS, (status, reviewer_id, now, application_id))
+            if status in DECISION_STATUSES:
+                self.audit.record(application_id, status, reviewer_id, now)
+    
+    def requeue(self, application_id: int):
+        """待审核的申请重新进入排队"""
+        with self.conn:
+            self.conn.execute(self.SQL_REQUEUE, (application_id,))
+    
+    def claim(self, application_id: int, reviewer_id: int) -> bool:
+        """认领待审核的申请，成功返回 True"""
+        with self.conn:
+            cursor = self.conn.execute(self.SQL_CLAIM, (reviewer_id, time.time(), application_id))
+        return cursor.rowcount == 1
+    
+    def release(self, application_id: int):
+        """处理失败时释放认领，申请重新变为待审核"""
+        with self.conn:
+            self.conn.execute(self.SQL_RELEASE, (application_id,))
+    
+    def release_stale_claims(self, max_age: float = 300.0) -> int:
+        """释放超过 max_age 秒仍未完成的认领"""
+        with self.conn:
+            cursor = self.conn.execute(self.SQL_RELEASE_STALE, (time.time() - max_age,))
+        return cursor.rowcount
+    
+    def count_pending(self, guild_id: int) -> int:
+        """服务器中待审核的申请数"""
+        return self.conn.execute(self.SQL_COUNT_PENDING, (guild_id,)).fetchone()[0]
+    
+    def oldest_pending(self, guild_id: int) -> Optional[float]:
+        """服务器中最早的待审核申请的提交时间，没有时返回 None"""
+        return self.conn.execute(self.SQL_OLDEST_PENDING, (guild_id,)).fetchone()[0]
+    
+    def oldest_pending_by_guild(self) -> List[tuple]:
+        """每个服务器最早的待审核申请的提交时间 [(服务器ID, 提交时间)]"""
+        return [tuple(row) for row in self.conn.execute(self.SQL_OLDEST_PENDING_BY_GUILD)]
+    
+    def list_approved_after(self, guild_id: int, after_id: int, limit: int) -> List[Dict[str, Any]]:
+        """按记录ID顺序列出 after_id 之后已通过的申请"""
+        return [dict(row) for row in self.conn.execute(self.SQL_LIST_APPROVED_AFTER, (guild_id, after_id, limit))]
+    
+    def approved_user_ids(self, guild_id: int) -> set:
+        """服务器中有已通过申请的用户ID"""
+        return {row[0] for row in self.conn.execute(self.SQL_APPROVED_USERS, (guild_id,))}
+    
+    def get_meta(self, key: str) -> Optional[str]:
+        """读取元数据"""
+        row = self.conn.execute(self.SQL_GET_META, (key,)).fetchone()
+        return row[0] if row else None
+    
+    def set_meta(self, key: str, value: str):
+        """写入元数据"""
+        with self.conn:
+            self.conn.execute(self.SQL_SET_META, (key, value))
+    
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
@@ -0,0 +1,181 @@
+import sqlite3
+import time
+from collections import defaultdict
+from typing import Dict, Any, List, Optional
+from logger import get_logger
+
+logger = get_logger('audit')
+
+# 记入审核历史的最终状态
+DECISION_STATUSES = ('approved', 'rejected', 'expired')
+
+# 审核等待时间分桶上限（秒），用于从汇总表估算中位数
+WAIT_BUCKETS = (60, 300, 900, 1800, 3600, 7200, 14400, 43200, 86400, 259200, 604800, float('inf'))
+
+def wait_bucket(seconds: float) -> int:
+    """等待时间所在的分桶下标"""
+    for index, bound in enumerate(WAIT_BUCKETS):
+        if seconds <= bound:
+            return index
+    return len(WAIT_BUCKETS) - 1
+
+def day_key(timestamp: float) -> str:
+    """按 UTC 日期汇总"""
+    return time.strftime('%Y-%m-%d', time.gmtime(timestamp))
+
+def bucket_quantile(counts: Dict[int, int], q: float) -> Optional[float]:
+    """根据分桶计数估算分位数（桶内线性插值）"""
+    total = sum(counts.values())
+    if not total:
+        return None
+    target = q * total
+    running = 0
+    for index, bound in enumerate(WAIT_BUCKETS):
+        count = counts.get(index, 0)
+        if count and running + count >= target:
+            lower = WAIT_BUCKETS[index - 1] if index else 0
+            if bound == float('inf'):
+                return lower
+            return lower + (bound - lower) * (target - running) / count
+        running += count
+    return WAIT_BUCKETS[-2]
+
+class AuditLog:
+    """审核历史：每个决定一行明细，并按 服务器/日期/审核者 维护汇总表
+    
+    与申请记录共用数据库连接，由 ApplicationStore 在更新状态的同一事务中写入。
+    统计查询只读汇总表，与明细行数无关。
+    """
+    
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS decisions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        application_id INTEGER,
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        reviewer_id INTEGER,
+        decision TEXT NOT NULL,
+        submitted_at REAL,
+        decided_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_decisions_guild_time ON decisions (guild_id, decided_at);
+    CREATE INDEX IF NOT EXISTS idx_decisions_guild_reviewer ON decisions (guild_id, reviewer_id, decided_at);
+    CREATE INDEX IF NOT EXISTS idx_decisions_guild_user ON decisions (guild_id, user_id, decided_at);
+    CREATE TABLE IF NOT EXISTS decision_rollups (
+        guild_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        reviewer_id INTEGER NOT NULL,
+        decision TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        total_wait REAL NOT NULL,
+        PRIMARY KEY (guild_id, day, reviewer_id, decision)
+    );
+    CREATE TABLE IF NOT EXISTS decision_wait_rollups (
+        guild_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (guild_id, day, bucket)
+    );
+    """
+    
+    SQL_APPLICATION = 'SELECT guild_id, user_id, created_at FROM applications WHERE id = ?'
+    SQL_INSERT = (
+        'INSERT INTO decisions (application_id, guild_id, user_id, reviewer_id, decision, submitted_at, decided_at) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)'
+    )
+    SQL_ROLLUP = (
+        'INSERT INTO decision_rollups (guild_id, day, reviewer_id, decision, count, total_wait) VALUES (?, ?, ?, ?, ?, ?) '
+        'ON CONFLICT(guild_id, day, reviewer_id, decision) DO UPDATE SET '
+        'count = count + excluded.count, total_wait = total_wait + excluded.total_wait'
+    )
+    SQL_WAIT_ROLLUP = (
+        'INSERT INTO decision_wait_rollups (guild_id, day, bucket, count) VALUES (?, ?, ?, ?) '
+        'ON CONFLICT(guild_id, day, bucket) DO UPDATE SET count = count + excluded.count'
+    )
+    SQL_TOTALS = (
+        'SELECT decision, SUM(count), SUM(total_wait) FROM decision_rollups '
+        'WHERE guild_id = ? AND day >= ? GROUP BY decision'
+    )
+    SQL_TOP_REVIEWERS = (
+        'SELECT reviewer_id, SUM(count) AS total FROM decision_rollups '
+        'WHERE guild_id = ? AND day >= ? AND reviewer_id != 0 GROUP BY reviewer_id ORDER BY total DESC LIMIT ?'
+    )
+    SQL_WAITS = 'SELECT bucket, SUM(count) FROM decision_wait_rollups WHERE guild_id = ? AND day >= ? GROUP BY bucket'
+    SQL_HISTORY = 'SELECT * FROM decisions WHERE guild_id = ? AND user_id = ? ORDER BY decided_at DESC LIMIT ?'
+    
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.conn.executescript(self.SCHEMA)
+    
+    def record(self, application_id: int, decision: str, reviewer_id: Optional[int], decided_at: float):
+        """记录一个审核决定（由调用方负责提交事务）"""
+        row = self.conn.execute(self.SQL_APPLICATION, (application_id,)).fetchone()
+        if row is None:
+            return
+        guild_id, user_id, submitted_at = row[0], row[1], row[2]
+        wait = max(0.0, decided_at - submitted_at) if submitted_at else 0.0
+        day = day_key(decided_at)
+        self.conn.execute(self.SQL_INSERT, (application_id, guild_id, user_id, reviewer_id, decision, submitted_at, decided_at))
+        self.conn.execute(self.SQL_ROLLUP, (guild_id, day, reviewer_id or 0, decision, 1, wait))
+        # 过期不是审核者的决定，不计入审核耗时
+        if decision != 'expired':
+            self.conn.execute(self.SQL_WAIT_ROLLUP, (guild_id, day, wait_bucket(wait), 1))
+    
+    def backfill(self) -> int:
+        """从已有的申请记录一次性导入历史决定，返回导入条数"""
+        if self.conn.execute('SELECT 1 FROM decisions LIMIT 1').fetchone():
+            return 0
+        placeholders = ', '.join('?' for _ in DECISION_STATUSES)
+        rows = self.conn.execute(
+            f'SELECT id, guild_id, user_id, reviewer_id, status, created_at, decided_at FROM applications '
+            f'WHERE status IN ({placeholders}) AND decided_at IS NOT NULL ORDER BY decided_at',
+            DECISION_STATUSES
+        ).fetchall()
+        if not rows:
+            return 0
+        
+        rollups = defaultdict(lambda: [0, 0.0])
+        waits = defaultdict(int)
+        for application_id, guild_id, user_id, reviewer_id, decision, submitted_at, decided_at in rows:
+            wait = max(0.0, decided_at - submitted_at) if submitted_at else 0.0
+            day = day_key(decided_at)
+            rollup = rollups[(guild_id, day, reviewer_id or 0, decision)]
+            rollup[0] += 1
+            rollup[1] += wait
+            if decision != 'expired':
+                waits[(guild_id, day, wait_bucket(wait))] += 1
+        
+        with self.conn:
+            self.conn.executemany(self.SQL_INSERT, [
+                (row[0], row[1], row[2], row[3], row[4], row[5], row[6]) for row in rows
+            ])
+            self.conn.executemany(self.SQL_ROLLUP, [key + tuple(value) for key, value in rollups.items()])
+            self.conn.executemany(self.SQL_WAIT_ROLLUP, [key + (count,) for key, count in waits.items()])
+        logger.info(f"已从申请记录导入 {len(rows)} 条审核历史")
+        return len(rows)
+    
+    def summary(self, guild_id: int, days: int, top: int = 5) -> Dict[str, Any]:
+        """统计最近 days 天（按 UTC 日期，含今天）的审核情况"""
+        since = day_key(time.time() - (days - 1) * 86400)
+        totals = {}
+        total_wait = 0.0
+        for decision, count, wait in self.conn.execute(self.SQL_TOTALS, (guild_id, since)):
+            totals[decision] = count
+            if decision != 'expired':
+                total_wait += wait
+        decided = totals.get('approved', 0) + totals.get('rejected', 0)
+        
+        waits = {bucket: count for bucket, count in self.conn.execute(self.SQL_WAITS, (guild_id, since))}
+        return {
+            'since': since,
+            'totals': totals,
+            'reviewers': [tuple(row) for row in self.conn.execute(self.SQL_TOP_REVIEWERS, (guild_id, since, top))],
+            'wait_avg': total_wait / decided if decided else None,
+            'wait_median': bucket_quantile(waits, 0.5),
+            'wait_p90': bucket_quantile(waits, 0.9),
+        }
+    
+    def history(self, guild_id: int, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+        """用户在服务器中的审核历史，最近的在前"""
+        return [dict(row) for row in self.conn.execute(self.SQL_HISTORY, (guild_id, user_id, limit))]
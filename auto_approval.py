@@ -0,0 +1,77 @@
+import re
+from typing import Any, Dict, Optional, Tuple
+from logger import get_logger
+
+logger = get_logger('auto_approval')
+
+def split_terms(value) -> tuple:
+    """将逗号分隔的字符串或列表整理为去重后的小写词组"""
+    if isinstance(value, str):
+        value = value.replace('，', ',').split(',')
+    elif not isinstance(value, (list, tuple)):
+        return ()
+    terms = (str(term).strip().lower() for term in value)
+    return tuple(dict.fromkeys(term for term in terms if term))
+
+class AutoApprovalRules:
+    """预编译的自动通过规则，随服务器配置快照一起构建
+    
+    启用后，申请需同时满足所有已设置的条件（账号天数、关键词、正则）且不含屏蔽词才会自动通过；
+    没有设置任何条件时不会自动通过任何申请。
+    """
+    __slots__ = ('enabled', 'min_account_days', 'keywords', 'pattern', 'pattern_text', 'blocklist')
+    
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        config = config if isinstance(config, dict) else {}
+        self.keywords: tuple = split_terms(config.get('keywords'))
+        self.blocklist: tuple = split_terms(config.get('blocklist'))
+        
+        try:
+            days = config.get('min_account_days')
+            self.min_account_days: Optional[int] = int(days) if days not in (None, '') else None
+        except (TypeError, ValueError):
+            self.min_account_days = None
+        
+        self.pattern_text: Optional[str] = config.get('pattern') or None
+        self.pattern = None
+        if self.pattern_text:
+            try:
+                self.pattern = re.compile(self.pattern_text, re.IGNORECASE)
+            except re.error as e:
+                logger.error(f"自动通过规则中的正则无效，已停用该规则: {e}")
+        
+        has_condition = bool(self.min_account_days is not None or self.keywords or self.pattern)
+        # 正则无效时整体停用，避免放宽条件
+        valid = not (self.pattern_text and self.pattern is None)
+        self.enabled: bool = bool(config.get('enabled')) and has_condition and valid
+    
+    def check(self, reason: str, account_age_days: Optional[float]) -> Tuple[bool, str]:
+        """检查申请是否满足自动通过条件，返回 (是否通过, 原因)"""
+        if not self.enabled:
+            return False, '未启用'
+        text = reason.lower()
+        for term in self.blocklist:
+            if term in text:
+                return False, f'包含屏蔽词 {term!r}'
+        if self.min_account_days is not None and (account_age_days is None or account_age_days < self.min_account_days):
+            return False, f'账号不足 {self.min_account_days} 天'
+        if self.keywords and not any(term in text for term in self.keywords):
+            return False, '未包含关键词'
+        if self.pattern is not None and not self.pattern.search(reason):
+            return False, '不匹配正则'
+        return True, '符合全部条件'
+    
+    def describe(self) -> str:
+        """规则的文字说明"""
+        lines = [f'状态: {"✅ 已启用" if self.enabled else "⏸️ 未启用"}']
+        if self.min_account_days is not None:
+            lines.append(f'最低账号天数: {self.min_account_days}')
+        if self.keywords:
+            lines.append(f'关键词（任一）: {", ".join(self.keywords)}')
+        if self.pattern_text:
+            lines.append(f'正则: `{self.pattern_text}`' + ('' if self.pattern is not None else '（无效）'))
+        if self.blocklist:
+            lines.append(f'屏蔽词: {", ".join(self.blocklist)}')
+        return '\n'.join(lines)
+
+DISABLED_RULES = AutoApprovalRules()
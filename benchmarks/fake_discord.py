@@ -0,0 +1,248 @@
+"""离线压测用的 Discord 替身对象
+
+只实现机器人代码实际用到的属性和方法。所有 API 调用都在本地完成，
+可通过 api_latency 模拟网络延迟。
+"""
+import asyncio
+import itertools
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+import discord
+
+_snowflakes = itertools.count(10 ** 17)
+
+def next_id() -> int:
+    return next(_snowflakes)
+
+class FakeAPI:
+    """模拟的 API 延迟与调用计数"""
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+    
+    async def call(self, route: str):
+        self.calls[route] = self.calls.get(route, 0) + 1
+        # 即使没有延迟也让出事件循环，和真实的网络请求一样
+        await asyncio.sleep(self.latency)
+
+class FakeRole:
+    def __init__(self, guild, name: str, position: int = 1):
+        self.id = next_id()
+        self.guild = guild
+        self.name = name
+        self.position = position
+        self.mention = f'<@&{self.id}>'
+    
+    def is_default(self) -> bool:
+        return False
+
+class FakeMember:
+    def __init__(self, guild, name: str, roles: Optional[List[FakeRole]] = None, administrator: bool = False):
+        self.id = next_id()
+        self.guild = guild
+        self.name = name
+        self.bot = False
+        self.roles = list(roles or [])
+        self.mention = f'<@{self.id}>'
+        self.created_at = datetime.now(timezone.utc) - timedelta(days=365)
+        self.joined_at = datetime.now(timezone.utc) - timedelta(hours=1)
+        self.guild_permissions = SimpleNamespace(administrator=administrator)
+        self.dm_count = 0
+    
+    @property
+    def top_role(self) -> FakeRole:
+        return max(self.roles, key=lambda role: role.position)
+    
+    async def add_roles(self, *roles, reason=None):
+        await self.guild.api.call('add_roles')
+        for role in roles:
+            if role not in self.roles:
+                self.roles.append(role)
+    
+    async def remove_roles(self, *roles, reason=None):
+        await self.guild.api.call('remove_roles')
+        self.roles = [role for role in self.roles if role not in roles]
+    
+    async def edit(self, *, roles=None, reason=None, **kwargs):
+        await self.guild.api.call('edit_member')
+        if roles is not None:
+            self.roles = list(roles)
+    
+    async def send(self, *args, **kwargs):
+        await self.guild.api.call('dm')
+        self.dm_count += 1
+    
+    def __str__(self):
+        return self.name
+
+class FakeMessage:
+    def __init__(self, channel, embed=None, view=None):
+        self.id = next_id()
+        self.channel = channel
+        self.embeds = [embed] if embed else []
+        self.view = view
+    
+    async def edit(self, *, embed=None, view=None, **kwargs):
+        await self.channel.guild.api.call('edit_message')
+        if embed is not None:
+            self.embeds = [embed]
+        self.view = view
+
+class FakeTextChannel:
+    def __init__(self, guild, name: str):
+        self.id = next_id()
+        self.guild = guild
+        self.name = name
+        self.mention = f'<#{self.id}>'
+        self.messages: Dict[int, FakeMessage] = {}
+    
+    def permissions_for(self, member):
+        return SimpleNamespace(send_messages=True, manage_roles=True)
+    
+    async def send(self, content=None, *, embed=None, view=None, **kwargs):
+        await self.guild.api.call('send_message')
+        message = FakeMessage(self, embed, view)
+        self.messages[message.id] = message
+        return message
+    
+    def get_partial_message(self, message_id: int) -> FakeMessage:
+        return self.messages[message_id]
+    
+    async def fetch_message(self, message_id: int) -> FakeMessage:
+        await self.guild.api.call('fetch_message')
+        return self.messages[message_id]
+
+class FakeGuild:
+    def __init__(self, api: FakeAPI, name: str):
+        self.id = next_id()
+        self.api = api
+        self.name = name
+        self.shard_id = 0
+        self.roles: Dict[int, FakeRole] = {}
+        self.members: Dict[int, FakeMember] = {}
+        self.channels: Dict[int, FakeTextChannel] = {}
+        self.me = self.add_member('bot', [self.add_role('bot', position=100)])
+        self.me.bot = True
+    
+    def add_role(self, name: str, position: int = 1) -> FakeRole:
+        role = FakeRole(self, name, position)
+        self.roles[role.id] = role
+        return role
+    
+    def add_member(self, name: str, roles=None, administrator: bool = False) -> FakeMember:
+        member = FakeMember(self, name, roles, administrator)
+        self.members[member.id] = member
+        return member
+    
+    def add_channel(self, name: str) -> FakeTextChannel:
+        channel = FakeTextChannel(self, name)
+        self.channels[channel.id] = channel
+        return channel
+    
+    def get_role(self, role_id: int) -> Optional[FakeRole]:
+        return self.roles.get(role_id)
+    
+    def get_member(self, user_id: int) -> Optional[FakeMember]:
+        return self.members.get(user_id)
+    
+    def get_channel(self, channel_id: int) -> Optional[FakeTextChannel]:
+        return self.channels.get(channel_id)
+    
+    async def fetch_member(self, user_id: int) -> FakeMember:
+        await self.api.call('fetch_member')
+        member = self.members.get(user_id)
+        if member is None:
+            raise discord.NotFound(SimpleNamespace(status=404, reason='Not Found'), 'Unknown Member')
+        return member
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self._done = False
+        self.modal = None
+        self.messages: list = []
+    
+    def is_done(self) -> bool:
+        return self._done
+    
+    async def _respond(self):
+        if self._done:
+            raise RuntimeError('交互已响应')
+        self._done = True
+        await self.interaction.guild.api.call('interaction_response')
+    
+    async def send_message(self, content=None, *, embed=None, ephemeral=False, **kwargs):
+        await self._respond()
+        self.messages.append(content or embed)
+    
+    async def send_modal(self, modal):
+        await self._respond()
+        self.modal = modal
+    
+    async def defer(self, *, ephemeral=False, thinking=False):
+        await self._respond()
+    
+    async def edit_message(self, *, embed=None, view=None, **kwargs):
+        await self._respond()
+        message = self.interaction.message
+        if embed is not None:
+            message.embeds = [embed]
+        message.view = view
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.messages: list = []
+    
+    async def send(self, content=None, *, embed=None, ephemeral=False, **kwargs):
+        await self.interaction.guild.api.call('followup')
+        self.messages.append(content or embed)
+
+class FakeInteraction:
+    def __init__(self, client, guild: FakeGuild, user: FakeMember, message: Optional[FakeMessage] = None):
+        self.client = client
+        self.guild = guild
+        self.guild_id = guild.id
+        self.user = user
+        self.message = message
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.created_at = datetime.now(timezone.utc)
+    
+    async def edit_original_response(self, *, embed=None, view=None, **kwargs):
+        await self.guild.api.call('edit_original_response')
+        if self.message is not None:
+            if embed is not None:
+                self.message.embeds = [embed]
+            self.message.view = view
+
+class FakeBot:
+    """替代 commands.Bot，提供机器人代码用到的属性"""
+    def __init__(self, config_manager, job_queue, member_cache, admission):
+        self.config_manager = config_manager
+        self.admission = admission
+        self.job_queue = job_queue
+        self.member_cache = member_cache
+        self._guilds: Dict[int, FakeGuild] = {}
+        self._channels: Dict[int, FakeTextChannel] = {}
+        self.latency = 0.0
+        self.shard_id = None
+        self.user = SimpleNamespace(id=next_id(), name='bench-bot')
+    
+    @property
+    def guilds(self) -> List[FakeGuild]:
+        return list(self._guilds.values())
+    
+    def add_guild(self, guild: FakeGuild):
+        self._guilds[guild.id] = guild
+        self._channels.update(guild.channels)
+    
+    def get_channel(self, channel_id: int):
+        return self._channels.get(channel_id)
+    
+    def get_guild(self, guild_id: int):
+        return self._guilds.get(guild_id)
+    
+    async def wait_until_ready(self):
+        pass
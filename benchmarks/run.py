@@ -0,0 +1,299 @@
+"""离线压测：不连接 Discord，直接驱动真实的命令、视图和数据层代码
+
+用法（在项目根目录运行）:
+    python -m benchmarks.run --guilds 1000 --concurrency 50 --ops 2000
+    python -m benchmarks.run --backend sqlite --api-latency-ms 30 --scenarios submit,approve
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks.fake_discord import FakeAPI, FakeBot, FakeGuild, FakeInteraction
+
+SCENARIOS = ('setup', 'config', 'panel', 'verify_button', 'submit', 'approve', 'reject')
+
+CONFIG_TEMPLATE = """[bot]
+token=BENCHMARK
+description=benchmark
+activity_type=playing
+activity_name=benchmark
+
+[database]
+backend={backend}
+db_path=verification.db
+
+[storage]
+write_behind={write_behind}
+flush_interval=1.0
+"""
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='验证机器人离线压测')
+    parser.add_argument('--guilds', type=int, default=200, help='模拟的服务器数量')
+    parser.add_argument('--concurrency', type=int, default=20, help='并发操作数')
+    parser.add_argument('--ops', type=int, default=1000, help='每个场景的操作次数')
+    parser.add_argument('--backend', choices=('json', 'sqlite'), default='json', help='存储后端')
+    parser.add_argument('--write-behind', action='store_true', help='JSON 后端启用延迟写入')
+    parser.add_argument('--api-latency-ms', type=float, default=0.0, help='模拟的 API 延迟（毫秒）')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='要运行的场景，逗号分隔')
+    parser.add_argument('--trace-memory', action='store_true', help='使用 tracemalloc 统计内存峰值（会降低吞吐）')
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args()
+
+class LoopMonitor:
+    """以固定间隔唤醒，统计事件循环被阻塞的时间"""
+    def __init__(self, interval: float = 0.001, threshold: float = 0.005):
+        self.interval = interval
+        self.threshold = threshold
+        self.blocked = 0.0
+        self.max_lag = 0.0
+        self._task = None
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = loop.time() - start - self.interval
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.threshold:
+                self.blocked += lag
+    
+    async def __aenter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        await asyncio.sleep(0)
+        return self
+    
+    async def __aexit__(self, *exc):
+        self._task.cancel()
+
+def percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+async def drain_background():
+    """等待审核通过的后台任务全部完成"""
+    import verification_views
+    while verification_views._background_tasks:
+        await asyncio.gather(*list(verification_views._background_tasks), return_exceptions=True)
+
+class Harness:
+    def __init__(self, args):
+        self.args = args
+        self.random = random.Random(args.seed)
+    
+    def setup(self):
+        from config_manager import ConfigManager
+        from job_queue import OutboundQueue
+        from member_cache import MemberCache
+        from admission import AdmissionController
+        from commands import VerificationCommands
+        
+        config_manager = ConfigManager()
+        # 压测只关心本地开销，放开出站队列的限速
+        job_queue = OutboundQueue(concurrency=max(4, self.args.concurrency), routes={
+            route: (1e9, 1e9, per_guild) for route, (_, _, per_guild) in OutboundQueue.DEFAULT_ROUTES.items()
+        })
+        admission = AdmissionController(config_manager.application_store, cooldown=0, per_minute=10 ** 9)
+        self.bot = FakeBot(config_manager, job_queue, MemberCache(max_size=100000), admission)
+        self.cog = VerificationCommands(self.bot, config_manager)
+        self.api = FakeAPI(self.args.api_latency_ms / 1000)
+        
+        self.guilds = []
+        for index in range(self.args.guilds):
+            guild = FakeGuild(self.api, f'guild-{index}')
+            review_channel = guild.add_channel('review')
+            panel_channel = guild.add_channel('verify')
+            verified_role = guild.add_role('verified', position=5)
+            admin_role = guild.add_role('admin', position=10)
+            admin = guild.add_member('admin', [admin_role], administrator=True)
+            guild.bench = SimpleNamespace(review=review_channel, panel=panel_channel, verified=verified_role,
+                                          admin_role=admin_role, admin=admin, cards=[])
+            self.bot.add_guild(guild)
+            self.guilds.append(guild)
+    
+    def pick_guild(self) -> FakeGuild:
+        return self.random.choice(self.guilds)
+    
+    # ---- 各场景的单次操作 ----
+    
+    async def op_setup(self, guild):
+        bench = guild.bench
+        interaction = FakeInteraction(self.bot, guild, bench.admin)
+        await self.cog.setup_verification.callback(self.cog, interaction, bench.review, bench.verified, bench.admin_role)
+    
+    async def op_config(self, guild):
+        interaction = FakeInteraction(self.bot, guild, guild.bench.admin)
+        await self.cog.view_config.callback(self.cog, interaction)
+    
+    async def op_panel(self, guild):
+        interaction = FakeInteraction(self.bot, guild, guild.bench.admin)
+        await self.cog.verification_panel.callback(self.cog, interaction, guild.bench.panel)
+    
+    async def op_verify_button(self, guild):
+        from verification_views import VerificationView
+        applicant = guild.add_member(f'user-{len(guild.members)}')
+        interaction = FakeInteraction(self.bot, guild, applicant)
+        view = VerificationView(self.bot.config_manager, self.bot)
+        await view.children[0].callback(interaction)
+    
+    async def op_submit(self, guild):
+        from verification_views import VerificationModal
+        applicant = guild.add_member(f'user-{len(guild.members)}')
+        interaction = FakeInteraction(self.bot, guild, applicant)
+        modal = VerificationModal(self.bot.config_manager, self.bot)
+        modal.reason._value = '我想加入这个服务器，和大家一起交流。'
+        await modal.on_submit(interaction)
+        # 记录审核卡片，供审核场景使用
+        guild.bench.cards.append((applicant.id, max(guild.bench.review.messages)))
+    
+    async def _review(self, guild, action: str):
+        from verification_views import ReviewButton
+        if not guild.bench.cards:
+            await self.op_submit(guild)
+        user_id, message_id = guild.bench.cards.pop()
+        message = guild.bench.review.messages[message_id]
+        interaction = FakeInteraction(self.bot, guild, guild.bench.admin, message)
+        await ReviewButton(action, user_id).callback(interaction)
+    
+    async def op_approve(self, guild):
+        await self._review(guild, 'approve')
+    
+    async def op_reject(self, guild):
+        await self._review(guild, 'reject')
+    
+    async def prepare(self, scenario: str):
+        """场景前的准备（不计入耗时）"""
+        if scenario in ('approve', 'reject'):
+            # 预先提交申请，审核场景只测审核本身
+            for _ in range(self.args.ops):
+                await self.op_submit(self.pick_guild())
+            await drain_background()
+    
+    async def run_scenario(self, scenario: str) -> dict:
+        await self.prepare(scenario)
+        operation = getattr(self, f'op_{scenario}')
+        targets = []
+        if scenario in ('approve', 'reject'):
+            targets = [guild for guild in self.guilds for _ in guild.bench.cards][:self.args.ops]
+            self.random.shuffle(targets)
+        else:
+            targets = [self.pick_guild() for _ in range(self.args.ops)]
+        
+        latencies = []
+        errors = 0
+        pending = asyncio.Queue()
+        for guild in targets:
+            pending.put_nowait(guild)
+        
+        async def worker():
+            nonlocal errors
+            while not pending.empty():
+                guild = pending.get_nowait()
+                start = time.perf_counter()
+                try:
+                    await operation(guild)
+                except Exception:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+        
+        if self.args.trace_memory:
+            tracemalloc.start()
+        async with LoopMonitor() as monitor:
+            start = time.perf_counter()
+            await asyncio.gather(*[worker() for _ in range(self.args.concurrency)])
+            await drain_background()
+            elapsed = time.perf_counter() - start
+        peak_kb = 0.0
+        if self.args.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            peak_kb = peak / 1024
+        
+        latencies.sort()
+        return {
+            'scenario': scenario,
+            'ops': len(latencies),
+            'errors': errors,
+            'ops_per_sec': len(latencies) / elapsed if elapsed else 0.0,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': (latencies[-1] if latencies else 0.0) * 1000,
+            'blocked_ms': monitor.blocked * 1000,
+            'max_lag_ms': monitor.max_lag * 1000,
+            'mem_peak_kb': peak_kb,
+        }
+
+def print_report(args, results, rss_mb: float):
+    print(f'服务器数 {args.guilds}，并发 {args.concurrency}，后端 {args.backend}'
+          f'{"（延迟写入）" if args.write_behind else ""}，模拟 API 延迟 {args.api_latency_ms}ms')
+    header = f'{"场景":<14}{"次数":>8}{"错误":>6}{"ops/s":>11}{"p50 ms":>10}{"p99 ms":>10}{"max ms":>10}{"阻塞 ms":>10}{"最大延迟 ms":>12}{"内存峰值 KB":>13}'
+    print(header)
+    for result in results:
+        print(f'{result["scenario"]:<14}{result["ops"]:>8}{result["errors"]:>6}{result["ops_per_sec"]:>11.1f}'
+              f'{result["p50_ms"]:>10.2f}{result["p99_ms"]:>10.2f}{result["max_ms"]:>10.2f}'
+              f'{result["blocked_ms"]:>10.1f}{result["max_lag_ms"]:>12.2f}{result["mem_peak_kb"]:>13.0f}')
+    
+    from metrics import registry
+    completion = registry.latency.get('approve_button.complete')
+    if completion and completion.count:
+        print(f'审核通过后台完成耗时: p50 <= {completion.quantile(0.5) * 1000:.0f}ms, p99 <= {completion.quantile(0.99) * 1000:.0f}ms')
+    print(f'进程常驻内存: {rss_mb:.1f} MB')
+
+async def run(args):
+    harness = Harness(args)
+    harness.setup()
+    harness.bot.job_queue.start()
+    harness.bot.config_manager.data_manager.start()
+    
+    # 所有服务器先完成配置，再运行各场景
+    for guild in harness.guilds:
+        await harness.op_setup(guild)
+    
+    results = []
+    try:
+        for scenario in args.scenarios.split(','):
+            scenario = scenario.strip()
+            if scenario not in SCENARIOS:
+                print(f'未知场景: {scenario}')
+                continue
+            results.append(await harness.run_scenario(scenario))
+    finally:
+        await harness.bot.job_queue.close()
+        await harness.bot.config_manager.data_manager.close()
+        harness.bot.config_manager.application_store.close()
+    
+    from metrics import get_memory_usage_mb
+    print_report(args, results, get_memory_usage_mb())
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix='verification-bench-')
+    original_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        with open('config.cfg', 'w', encoding='utf-8') as f:
+            f.write(CONFIG_TEMPLATE.format(backend=args.backend, write_behind=str(args.write_behind).lower()))
+        # 压测时只输出警告以上的日志
+        from logger import setup_logger
+        setup_logger().setLevel('WARNING')
+        asyncio.run(run(args))
+    finally:
+        os.chdir(original_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
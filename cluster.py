@@ -0,0 +1,81 @@
+import asyncio
+import multiprocessing
+import time
+from typing import List, Optional
+import aiohttp
+from config_manager import ConfigManager
+from logger import setup_logger
+
+logger = setup_logger()
+
+GATEWAY_URL = 'https://discord.com/api/v10/gateway/bot'
+
+async def fetch_recommended_shards(token: str) -> int:
+    """向 Discord 查询推荐的分片数"""
+    headers = {'Authorization': f'Bot {token}'}
+    async with aiohttp.ClientSession() as session:
+        async with session.get(GATEWAY_URL, headers=headers) as response:
+            response.raise_for_status()
+            data = await response.json()
+            return int(data['shards'])
+
+def split_shards(shard_count: int, processes: int) -> List[List[int]]:
+    """将分片按连续区间平均分配到各进程"""
+    processes = min(processes, shard_count)
+    base, extra = divmod(shard_count, processes)
+    ranges = []
+    start = 0
+    for index in range(processes):
+        size = base + (1 if index < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+def run_worker(shard_ids: List[int], shard_count: int):
+    """工作进程入口"""
+    import main
+    asyncio.run(main.main(shard_ids, shard_count))
+
+def launch(processes: Optional[int] = None):
+    """启动多进程集群，工作进程退出后自动重启"""
+    config_manager = ConfigManager()
+    backend, _ = config_manager.get_database_config()
+    if backend != 'sqlite':
+        logger.error('多进程模式需要在 config.cfg 中设置 [database] backend=sqlite，以便各进程共享配置')
+        return
+    
+    processes = processes or config_manager.get_cluster_processes()
+    _, shard_count = config_manager.get_shard_config()
+    if not shard_count:
+        shard_count = asyncio.run(fetch_recommended_shards(config_manager.get_bot_token()))
+        logger.info(f'Discord 推荐分片数: {shard_count}')
+    
+    shard_ranges = split_shards(shard_count, processes)
+    # 使用 spawn，避免子进程继承父进程的数据库连接
+    context = multiprocessing.get_context('spawn')
+    
+    workers = {}
+    for index, shard_ids in enumerate(shard_ranges):
+        workers[index] = context.Process(target=run_worker, args=(shard_ids, shard_count), name=f'worker-{index}')
+        workers[index].start()
+        logger.info(f'工作进程 {index} 已启动 (PID {workers[index].pid})，分片 {shard_ids[0]}-{shard_ids[-1]}')
+    
+    try:
+        while True:
+            time.sleep(5)
+            for index, process in workers.items():
+                if process.is_alive():
+                    continue
+                logger.warning(f'工作进程 {index} 已退出 (退出码 {process.exitcode})，正在重启')
+                shard_ids = shard_ranges[index]
+                workers[index] = context.Process(target=run_worker, args=(shard_ids, shard_count), name=f'worker-{index}')
+                workers[index].start()
+    except KeyboardInterrupt:
+        logger.info('正在停止所有工作进程...')
+        for process in workers.values():
+            process.terminate()
+        for process in workers.values():
+            process.join()
+
+if __name__ == '__main__':
+    launch()
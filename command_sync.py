@@ -0,0 +1,69 @@
+import hashlib
+import json
+import os
+from typing import Optional
+import discord
+from logger import get_logger
+
+logger = get_logger('sync')
+
+def fingerprint_tree(tree: discord.app_commands.CommandTree, guild: Optional[discord.abc.Snowflake] = None) -> str:
+    """计算命令树的指纹（名称、描述、参数等完整定义）"""
+    payload = [command.to_dict(tree) for command in tree.get_commands(guild=guild)]
+    payload.sort(key=lambda item: (item.get('type', 1), item['name']))
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+class CommandSyncer:
+    """只在命令树变化时同步斜杠命令，并记录上次同步的指纹"""
+    
+    def __init__(self, state_file: str = 'command_sync.json', mode: str = 'auto', dev_guild_id: Optional[int] = None):
+        self.state_file = state_file
+        self.mode = mode
+        self.dev_guild_id = dev_guild_id
+    
+    def _load_state(self) -> dict:
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, OSError):
+                return {}
+        return {}
+    
+    def _save_state(self, state: dict):
+        tmp_path = f'{self.state_file}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_file)
+    
+    async def sync(self, bot, force: bool = False) -> Optional[list]:
+        """按需同步命令；未同步时返回 None"""
+        if self.mode == 'never' and not force:
+            logger.info('已禁用启动时同步斜杠命令')
+            return None
+        
+        guild = None
+        scope = 'global'
+        if self.dev_guild_id:
+            # 开发模式：复制全局命令到测试服务器，同步立即生效
+            guild = discord.Object(id=self.dev_guild_id)
+            bot.tree.copy_global_to(guild=guild)
+            scope = f'guild:{self.dev_guild_id}'
+        
+        key = f'{bot.application_id}:{scope}'
+        fingerprint = fingerprint_tree(bot.tree, guild)
+        state = self._load_state()
+        
+        if not force and self.mode == 'auto' and state.get(key) == fingerprint:
+            logger.info(f'斜杠命令未变化，跳过同步 ({scope})')
+            return None
+        
+        synced = await bot.tree.sync(guild=guild)
+        state[key] = fingerprint
+        try:
+            self._save_state(state)
+        except OSError as e:
+            logger.warning(f'保存命令同步状态失败: {e}')
+        logger.info(f'已同步 {len(synced)} 个斜杠命令 ({scope})')
+        return synced
@@ -1,11 +1,32 @@
+import asyncio
+import re
+import time
 import discord
 from discord.ext import commands
 from discord import app_commands
-from verification_views import VerificationView
+from typing import Optional
+from auto_approval import split_terms
+from verification_views import (VerificationView, build_decision_embed, approve_application, claim_application,
+                                finish_claim, already_handled_message)
+from job_queue import PRIORITY_MESSAGE
+import profiler
+from metrics import instrument
 from logger import get_logger
 
 logger = get_logger('commands')
 
+def format_duration(seconds: Optional[float]) -> str:
+    """将秒数格式化为便于阅读的时长"""
+    if seconds is None:
+        return '无数据'
+    if seconds < 60:
+        return f'{seconds:.0f} 秒'
+    if seconds < 3600:
+        return f'{seconds / 60:.1f} 分钟'
+    if seconds < 86400:
+        return f'{seconds / 3600:.1f} 小时'
+    return f'{seconds / 86400:.1f} 天'
+
 class VerificationCommands(commands.Cog):
     def __init__(self, bot, config_manager):
         self.bot = bot
@@ -13,6 +34,7 @@ class VerificationCommands(commands.Cog):
     
     @app_commands.command(name="验证面板", description="在指定频道创建验证面板")
     @app_commands.describe(频道="选择要发送验证面板的频道")
+    @instrument('验证面板')
     async def verification_panel(self, interaction: discord.Interaction, 频道: discord.TextChannel):
         """创建验证面板"""
         user_roles = [role.id for role in interaction.user.roles]
@@ -67,6 +89,7 @@ class VerificationCommands(commands.Cog):
         验证身份组="选择验证身份组",
         管理员身份组="选择管理员身份组（可选）"
     )
+    @instrument('设置')
     async def setup_verification(
         self, 
         interaction: discord.Interaction,
@@ -127,6 +150,7 @@ class VerificationCommands(commands.Cog):
             await interaction.response.send_message('❌ 保存配置失败！请稍后重试。', ephemeral=True)
     
     @app_commands.command(name="配置", description="查看或修改当前服务器的验证配置")
+    @instrument('配置')
     async def view_config(self, interaction: discord.Interaction):
         """查看配置"""
         user_roles = [role.id for role in interaction.user.roles]
@@ -183,6 +207,32 @@ class VerificationCommands(commands.Cog):
         else:
             embed.add_field(name='👑 管理员身份组', value='未设置', inline=False)
         
+        # 审核模式
+        review_mode, digest_window = self.config_manager.get_review_mode(interaction.guild.id)
+        embed.add_field(
+            name='🗂️ 审核模式',
+            value=f'汇总（每 {int(digest_window)} 秒）' if review_mode == 'digest' else '卡片',
+            inline=False
+        )
+        
+        # 审核通过时调整的身份组
+        add_ids, remove_ids = self.config_manager.get_outcome_roles(interaction.guild.id)
+        extra_ids = [role_id for role_id in add_ids if role_id != verified_role_id]
+        if extra_ids or remove_ids:
+            lines = []
+            if extra_ids:
+                lines.append('添加: ' + ' '.join(self._role_mention(interaction.guild, role_id) for role_id in extra_ids))
+            if remove_ids:
+                lines.append('移除: ' + ' '.join(self._role_mention(interaction.guild, role_id) for role_id in remove_ids))
+            embed.add_field(name='🔁 通过时额外调整', value='\n'.join(lines), inline=False)
+        
+        # 申请有效期
+        expire_after = self.config_manager.get_expire_after(interaction.guild.id)
+        embed.add_field(name='⌛ 申请有效期', value=f'{expire_after / 3600:g} 小时' if expire_after else '不过期', inline=False)
+        
+        # 自动通过规则
+        embed.add_field(name='🤖 自动通过', value=self.config_manager.get_auto_rules(interaction.guild.id).describe(), inline=False)
+        
         # 配置状态
         is_complete = self.config_manager.is_config_complete(interaction.guild.id)
         status = "✅ 已完成" if is_complete else "⚠️ 未完成"
@@ -197,17 +247,456 @@ class VerificationCommands(commands.Cog):
         
         await interaction.response.send_message(embed=embed)
     
+    @app_commands.command(name="审核模式", description="设置新申请在审核频道中的展示方式")
+    @app_commands.describe(
+        模式="卡片：每个申请一张审核卡片；汇总：定期把新申请合并为一条可分页的消息",
+        汇总间隔="汇总模式下合并申请的时间窗口，单位秒（默认 60）"
+    )
+    @app_commands.choices(模式=[
+        app_commands.Choice(name='卡片', value='card'),
+        app_commands.Choice(name='汇总', value='digest')
+    ])
+    @instrument('审核模式')
+    async def review_mode(
+        self,
+        interaction: discord.Interaction,
+        模式: app_commands.Choice[str],
+        汇总间隔: app_commands.Range[int, 10, 3600] = 60
+    ):
+        """设置审核模式"""
+        user_roles = [role.id for role in interaction.user.roles]
+        if not self.config_manager.is_admin(user_roles, interaction.guild.id) and not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message('❌ 你没有权限使用此命令！', ephemeral=True)
+            return
+        
+        await interaction.response.defer(ephemeral=True)
+        
+        if not self.config_manager.set_server_config(interaction.guild.id, review_mode=模式.value, digest_window=汇总间隔):
+            await interaction.followup.send('❌ 保存配置失败，请稍后重试！', ephemeral=True)
+            return
+        
+        # 切换回卡片模式后，立即把尚未汇总的申请发出去，避免遗漏
+        if 模式.value == 'card':
+            await self.bot.digest.flush(self.bot, guild_id=interaction.guild.id, force=True)
+        
+        logger.info(f"服务器 {interaction.guild.name} 审核模式设置为 {模式.value}",
+                    extra={'guild_id': interaction.guild.id, 'user_id': interaction.user.id})
+        if 模式.value == 'digest':
+            message = f'✅ 已切换为汇总模式，新申请每 {汇总间隔} 秒合并发送一次。'
+        else:
+            message = '✅ 已切换为卡片模式，每个新申请单独发送审核卡片。'
+        await interaction.followup.send(message, ephemeral=True)
+    
+    @app_commands.command(name="自动审核", description="设置自动通过规则，符合条件的申请无需人工审核")
+    @app_commands.describe(
+        启用="是否启用自动通过",
+        最低账号天数="账号创建至少多少天（填 -1 清除）",
+        关键词="申请原因需包含其中任一关键词，用逗号分隔（填 - 清除）",
+        正则="申请原因需匹配的正则表达式（填 - 清除）",
+        屏蔽词="包含任一屏蔽词的申请转人工审核，用逗号分隔（填 - 清除）"
+    )
+    @instrument('自动审核')
+    async def auto_approval(
+        self,
+        interaction: discord.Interaction,
+        启用: bool,
+        最低账号天数: Optional[app_commands.Range[int, -1, 3650]] = None,
+        关键词: Optional[str] = None,
+        正则: Optional[str] = None,
+        屏蔽词: Optional[str] = None
+    ):
+        """设置自动通过规则"""
+        user_roles = [role.id for role in interaction.user.roles]
+        if not self.config_manager.is_admin(user_roles, interaction.guild.id) and not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message('❌ 你没有权限使用此命令！', ephemeral=True)
+            return
+        
+        # 未填写的选项保留原值
+        rules = dict(self.config_manager.get_server_config(interaction.guild.id).get('auto_approve') or {})
+        rules['enabled'] = 启用
+        if 最低账号天数 is not None:
+            rules['min_account_days'] = None if 最低账号天数 < 0 else 最低账号天数
+        if 关键词 is not None:
+            rules['keywords'] = [] if 关键词.strip() == '-' else list(split_terms(关键词))
+        if 屏蔽词 is not None:
+            rules['blocklist'] = [] if 屏蔽词.strip() == '-' else list(split_terms(屏蔽词))
+        if 正则 is not None:
+            pattern = None if 正则.strip() == '-' else 正则.strip()
+            if pattern:
+                try:
+                    re.compile(pattern)
+                except re.error as e:
+                    await interaction.response.send_message(f'❌ 正则表达式无效: {e}', ephemeral=True)
+                    return
+            rules['pattern'] = pattern
+        
+        if not self.config_manager.set_server_config(interaction.guild.id, auto_approve=rules):
+            await interaction.response.send_message('❌ 保存配置失败，请稍后重试！', ephemeral=True)
+            return
+        
+        compiled = self.config_manager.get_auto_rules(interaction.guild.id)
+        logger.info(f"服务器 {interaction.guild.name} 自动通过规则已更新: {rules}",
+                    extra={'guild_id': interaction.guild.id, 'user_id': interaction.user.id})
+        embed = discord.Embed(title='🤖 自动通过规则', description=compiled.describe(), color=discord.Color.green())
+        if 启用 and not compiled.enabled:
+            embed.add_field(name='⚠️ 提示', value='至少需要设置一个条件（账号天数、关键词或正则）才会自动通过申请', inline=False)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+    
+    @staticmethod
+    def _role_mention(guild: discord.Guild, role_id: int) -> str:
+        role = guild.get_role(role_id)
+        return role.mention if role else f'身份组不存在 (ID: {role_id})'
+    
+    @app_commands.command(name="通过身份组", description="设置审核通过时额外添加和移除的身份组")
+    @app_commands.describe(
+        额外身份组1="通过时额外添加的身份组",
+        额外身份组2="通过时额外添加的身份组",
+        额外身份组3="通过时额外添加的身份组",
+        移除身份组1="通过时移除的身份组（如“未验证”）",
+        移除身份组2="通过时移除的身份组"
+    )
+    @instrument('通过身份组')
+    async def outcome_roles(
+        self,
+        interaction: discord.Interaction,
+        额外身份组1: Optional[discord.Role] = None,
+        额外身份组2: Optional[discord.Role] = None,
+        额外身份组3: Optional[discord.Role] = None,
+        移除身份组1: Optional[discord.Role] = None,
+        移除身份组2: Optional[discord.Role] = None
+    ):
+        """设置审核通过时的身份组变化，未填写任何身份组时清除设置"""
+        if not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message('❌ 只有服务器管理员才能设置通过身份组！', ephemeral=True)
+            return
+        
+        guild = interaction.guild
+        extra_roles = list(dict.fromkeys(role for role in (额外身份组1, 额外身份组2, 额外身份组3) if role))
+        remove_roles = list(dict.fromkeys(role for role in (移除身份组1, 移除身份组2) if role))
+        verified_role_id = self.config_manager.get_verified_role_id(guild.id)
+        
+        # 机器人只能调整低于自己最高身份组、且不由集成管理的身份组
+        for role in extra_roles + remove_roles:
+            if role.is_default() or role.managed:
+                await interaction.response.send_message(f'❌ 身份组 {role.mention} 无法手动分配！', ephemeral=True)
+                return
+            if role.position >= guild.me.top_role.position:
+                await interaction.response.send_message(f'❌ 机器人没有权限调整身份组 {role.mention}！请确保机器人的身份组位置高于该身份组。', ephemeral=True)
+                return
+        for role in remove_roles:
+            if role.id == verified_role_id or role in extra_roles:
+                await interaction.response.send_message(f'❌ 身份组 {role.mention} 不能既添加又移除！', ephemeral=True)
+                return
+        
+        success = self.config_manager.set_server_config(
+            guild.id,
+            extra_role_ids=[role.id for role in extra_roles if role.id != verified_role_id],
+            remove_role_ids=[role.id for role in remove_roles]
+        )
+        if not success:
+            await interaction.response.send_message('❌ 保存配置失败，请稍后重试！', ephemeral=True)
+            return
+        
+        logger.info(
+            f"服务器 {guild.name} 通过身份组已更新: 添加 {[role.name for role in extra_roles]} 移除 {[role.name for role in remove_roles]}",
+            extra={'guild_id': guild.id, 'user_id': interaction.user.id}
+        )
+        embed = discord.Embed(title='🔁 通过身份组', color=discord.Color.green())
+        embed.add_field(name='额外添加', value=' '.join(role.mention for role in extra_roles) or '无', inline=False)
+        embed.add_field(name='移除', value=' '.join(role.mention for role in remove_roles) or '无', inline=False)
+        if not extra_roles and not remove_roles:
+            embed.description = '已清除设置，通过时只添加验证身份组。'
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+    
+    @app_commands.command(name="申请有效期", description="设置待审核申请的有效期，超时未审核的申请自动关闭")
+    @app_commands.describe(小时="申请提交后多少小时未审核即关闭（填 0 表示不过期）")
+    @instrument('申请有效期')
+    async def expiry_setting(self, interaction: discord.Interaction, 小时: app_commands.Range[int, 0, 720]):
+        """设置申请有效期"""
+        user_roles = [role.id for role in interaction.user.roles]
+        if not self.config_manager.is_admin(user_roles, interaction.guild.id) and not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message('❌ 你没有权限使用此命令！', ephemeral=True)
+            return
+        
+        if not self.config_manager.set_server_config(interaction.guild.id, expire_hours=小时):
+            await interaction.response.send_message('❌ 保存配置失败，请稍后重试！', ephemeral=True)
+            return
+        
+        # 按新的有效期重新安排，已超时的申请会立即关闭
+        if self.bot.expiry:
+            self.bot.expiry.reschedule(self.bot, interaction.guild.id)
+        
+        logger.info(f"服务器 {interaction.guild.name} 申请有效期设置为 {小时} 小时",
+                    extra={'guild_id': interaction.guild.id, 'user_id': interaction.user.id})
+        if 小时:
+            message = f'✅ 待审核申请超过 {小时} 小时未处理将自动关闭，申请者可以重新提交。'
+        else:
+            message = '✅ 待审核申请不再过期。'
+        if not self.bot.expiry:
+            message += '\n⚠️ config.cfg 中 `[expiry] enabled` 为 false，设置在启用后生效。'
+        await interaction.response.send_message(message, ephemeral=True)
+    
+    @app_commands.command(name="统计", description="查看最近的审核统计")
+    @app_commands.describe(天数="统计最近多少天（默认 7 天）", 用户="查看指定用户的审核历史（可选）")
+    @instrument('统计')
+    async def review_stats(self, interaction: discord.Interaction, 天数: app_commands.Range[int, 1, 365] = 7,
+                           用户: Optional[discord.User] = None):
+        """审核统计"""
+        user_roles = [role.id for role in interaction.user.roles]
+        if not self.config_manager.is_admin(user_roles, interaction.guild.id) and not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message('❌ 你没有权限使用此命令！', ephemeral=True)
+            return
+        
+        store = self.config_manager.application_store
+        if 用户 is not None:
+            await interaction.response.send_message(embed=self.build_history_embed(interaction.guild.id, 用户))
+            return
+        
+        summary = store.audit.summary(interaction.guild.id, 天数)
+        totals = summary['totals']
+        
+        embed = discord.Embed(
+            title=f'📈 最近 {天数} 天审核统计',
+            description=f'自 {summary["since"]}（UTC）起',
+            color=discord.Color.blue()
+        )
+        embed.add_field(name='✅ 通过', value=str(totals.get('approved', 0)), inline=True)
+        embed.add_field(name='❌ 拒绝', value=str(totals.get('rejected', 0)), inline=True)
+        embed.add_field(name='⌛ 过期', value=str(totals.get('expired', 0)), inline=True)
+        embed.add_field(name='⏳ 当前待审核', value=str(store.count_pending(interaction.guild.id)), inline=True)
+        embed.add_field(
+            name='⏱️ 审核耗时',
+            value=(
+                f'中位数 {format_duration(summary["wait_median"])}\n'
+                f'P90 {format_duration(summary["wait_p90"])}\n'
+                f'平均 {format_duration(summary["wait_avg"])}'
+            ),
+            inline=True
+        )
+        reviewers = summary['reviewers']
+        embed.add_field(
+            name='👮 审核者',
+            value='\n'.join(f'<@{reviewer_id}>: {count}' for reviewer_id, count in reviewers) or '无',
+            inline=False
+        )
+        await interaction.response.send_message(embed=embed)
+    
+    def build_history_embed(self, guild_id: int, user) -> discord.Embed:
+        """用户在服务器中最近的审核历史"""
+        labels = {'approved': '✅ 通过', 'rejected': '❌ 拒绝', 'expired': '⌛ 过期'}
+        history = self.config_manager.application_store.audit.history(guild_id, user.id)
+        embed = discord.Embed(
+            title='📜 审核历史',
+            description=f'申请者: {user.mention}',
+            color=discord.Color.blue()
+        )
+        lines = []
+        for entry in history:
+            wait = entry['decided_at'] - entry['submitted_at'] if entry['submitted_at'] else None
+            reviewer = f"<@{entry['reviewer_id']}>" if entry['reviewer_id'] else '自动'
+            lines.append(
+                f"<t:{int(entry['decided_at'])}:f> {labels.get(entry['decision'], entry['decision'])} "
+                f"· {reviewer} · 等待 {format_duration(wait)}"
+            )
+        embed.add_field(name=f'最近 {len(history)} 条', value='\n'.join(lines) or '无记录', inline=False)
+        return embed
+    
+    @app_commands.command(name="批量审核", description="按条件批量通过或拒绝待审核的申请")
+    @app_commands.describe(
+        操作="通过或拒绝",
+        提交超过小时="只处理提交时间超过指定小时数的申请（可选）",
+        账号天数="只处理账号创建超过指定天数的申请（可选）",
+        数量="最多处理的申请数量（默认 50）"
+    )
+    @app_commands.choices(操作=[
+        app_commands.Choice(name='通过', value='approve'),
+        app_commands.Choice(name='拒绝', value='reject')
+    ])
+    @instrument('批量审核')
+    async def bulk_review(
+        self,
+        interaction: discord.Interaction,
+        操作: app_commands.Choice[str],
+        提交超过小时: Optional[float] = None,
+        账号天数: Optional[int] = None,
+        数量: app_commands.Range[int, 1, 200] = 50
+    ):
+        """批量审核"""
+        user_roles = [role.id for role in interaction.user.roles]
+        if not self.config_manager.is_admin(user_roles, interaction.guild.id):
+            await interaction.response.send_message('❌ 你没有权限使用此命令！', ephemeral=True)
+            return
+        
+        approve = 操作.value == 'approve'
+        verified_role = None
+        if approve:
+            verified_role_id = self.config_manager.get_verified_role_id(interaction.guild.id)
+            verified_role = interaction.guild.get_role(verified_role_id) if verified_role_id else None
+            if not verified_role:
+                await interaction.response.send_message('❌ 验证身份组未设置或不存在！', ephemeral=True)
+                return
+        
+        # 按条件筛选待审核申请
+        now = time.time()
+        applications = self.config_manager.application_store.list_pending(
+            interaction.guild.id,
+            submitted_before=now - 提交超过小时 * 3600 if 提交超过小时 is not None else None,
+            account_created_before=now - 账号天数 * 86400 if 账号天数 is not None else None,
+            limit=数量
+        )
+        if not applications:
+            await interaction.response.send_message('没有符合条件的待审核申请。', ephemeral=True)
+            return
+        
+        await interaction.response.defer(thinking=True)
+        
+        start = time.perf_counter()
+        results = await asyncio.gather(*[
+            self._bulk_decide(interaction.guild, interaction.user, application, approve)
+            for application in applications
+        ])
+        elapsed = time.perf_counter() - start
+        
+        succeeded = sum(1 for ok, _ in results if ok)
+        failed = len(results) - succeeded
+        logger.info(f"批量审核: {interaction.user} 批量{操作.name} {len(results)} 个申请，成功 {succeeded}，失败 {failed}，耗时 {elapsed:.2f} 秒")
+        
+        # 汇总结果
+        lines = [line for _, line in results]
+        description = ''
+        for index, line in enumerate(lines):
+            if len(description) + len(line) + 1 > 3900:
+                description += f'\n…… 其余 {len(lines) - index} 条未显示'
+                break
+            description += line + '\n'
+        embed = discord.Embed(
+            title=f'📦 批量{操作.name}完成',
+            description=description,
+            color=discord.Color.green() if not failed else discord.Color.orange()
+        )
+        embed.add_field(name='成功', value=str(succeeded), inline=True)
+        embed.add_field(name='失败', value=str(failed), inline=True)
+        embed.add_field(name='耗时', value=f'{elapsed:.1f} 秒', inline=True)
+        await interaction.followup.send(embed=embed)
+    
+    async def _bulk_decide(self, guild: discord.Guild, reviewer: discord.Member, application: dict, approve: bool) -> tuple:
+        """处理批量审核中的一个申请，返回 (是否成功, 结果描述)"""
+        user_id = application['user_id']
+        member = guild.get_member(user_id) or self.bot.member_cache.get(guild.id, user_id)
+        store = self.config_manager.application_store
+        
+        # 与审核按钮同时操作时，只有认领成功的一方处理
+        holder = claim_application(store, application['id'], reviewer.id)
+        if holder is not None:
+            return False, f'<@{user_id}>: {already_handled_message(holder)}'
+        
+        decided = False
+        role_names = None
+        try:
+            if approve:
+                result = await approve_application(self.bot, guild, user_id, application['id'], reviewer.id)
+                if result.error:
+                    return False, f'<@{user_id}>: {result.error}'
+                member = result.member
+                role_names = result.role_names
+            else:
+                store.set_status(application['id'], 'rejected', reviewer.id)
+            decided = True
+        finally:
+            finish_claim(store, application['id'], decided)
+        
+        # 更新审核卡片
+        channel = guild.get_channel(application['channel_id']) if application['channel_id'] else None
+        if channel and application['message_id']:
+            embed = build_decision_embed(approve, member.mention if member else f'<@{user_id}>', application['reason'],
+                                         reviewer.mention, role_names)
+            message = channel.get_partial_message(application['message_id'])
+            try:
+                await self.bot.job_queue.submit('edit_message', lambda: message.edit(embed=embed, view=None), priority=PRIORITY_MESSAGE, guild_id=guild.id)
+            except discord.HTTPException as e:
+                logger.warning(f"批量审核: 更新审核卡片 {application['message_id']} 失败: {e}")
+        
+        return True, f'✅ <@{user_id}>'
+    
     @commands.command(name='sync')
     @commands.is_owner()
     async def sync_commands(self, ctx):
         """强制同步斜杠命令（仅限机器人所有者）"""
         try:
-            synced = await ctx.bot.tree.sync()
+            synced = await ctx.bot.command_syncer.sync(ctx.bot, force=True)
             await ctx.send(f'✅ 已强制同步 {len(synced)} 个斜杠命令')
             for command in synced:
                 print(f'   - /{command.name}')
         except Exception as e:
             await ctx.send(f'❌ 同步失败: {e}')
+    
+    @commands.command(name='latency')
+    @commands.is_owner()
+    async def shard_latency(self, ctx):
+        """查看各分片的网关延迟（仅限机器人所有者）"""
+        latencies = getattr(ctx.bot, 'latencies', None) or [(ctx.bot.shard_id or 0, ctx.bot.latency)]
+        lines = []
+        for shard_id, latency in latencies:
+            guild_count = sum(1 for guild in ctx.bot.guilds if guild.shard_id == shard_id)
+            lines.append(f'分片 {shard_id}: {latency * 1000:.0f}ms ({guild_count} 个服务器)')
+        await ctx.send('📡 分片延迟\n```\n' + '\n'.join(lines) + '\n```')
+    
+    @commands.command(name='queue')
+    @commands.is_owner()
+    async def queue_stats(self, ctx):
+        """查看出站请求队列状态（仅限机器人所有者）"""
+        stats = ctx.bot.job_queue.stats()
+        lines = [f'{key}: {value}' for key, value in stats.items()]
+        await ctx.send('📊 出站请求队列\n```\n' + '\n'.join(lines) + '\n```')
+    
+    @commands.command(name='reconcile')
+    @commands.is_owner()
+    async def reconcile_stats(self, ctx):
+        """查看身份组核对结果（仅限机器人所有者）"""
+        if ctx.bot.reconciler is None:
+            await ctx.send('身份组核对未启用。')
+            return
+        stats = ctx.bot.reconciler.stats()
+        lines = [f'{key}: {value}' for key, value in stats.items()]
+        await ctx.send('🔍 身份组核对\n```\n' + '\n'.join(lines) + '\n```')
+    
+    @commands.command(name='profile')
+    @commands.is_owner()
+    async def profile_cpu(self, ctx, seconds: float = 10.0):
+        """采样事件循环的 CPU 耗时（仅限机器人所有者）"""
+        if profiler.is_busy():
+            await ctx.send('⏳ 已有采样正在进行，请稍后再试。')
+            return
+        seconds = min(max(seconds, 1.0), profiler.MAX_SECONDS)
+        await ctx.send(f'⏱️ 正在采样 CPU {seconds:.0f} 秒…')
+        path, lines = await profiler.profile_cpu(seconds)
+        await ctx.send(f'🔥 自身耗时最多的函数（完整报告: `{path}`）\n```\n' + '\n'.join(lines)[:1800] + '\n```',
+                       file=discord.File(path))
+    
+    @commands.command(name='memprofile')
+    @commands.is_owner()
+    async def profile_memory(self, ctx, seconds: float = 30.0):
+        """采样一段时间内的内存分配（仅限机器人所有者）"""
+        if profiler.is_busy():
+            await ctx.send('⏳ 已有采样正在进行，请稍后再试。')
+            return
+        seconds = min(max(seconds, 1.0), profiler.MAX_SECONDS)
+        await ctx.send(f'⏱️ 正在跟踪内存分配 {seconds:.0f} 秒…')
+        path, lines = await profiler.profile_memory(seconds)
+        await ctx.send(f'🧠 内存增长最多的位置（完整报告: `{path}`）\n```\n' + '\n'.join(lines)[:1800] + '\n```',
+                       file=discord.File(path))
+    
+    @commands.command(name='objects')
+    @commands.is_owner()
+    async def live_objects(self, ctx):
+        """查看存活的视图、模态框和后台任务数量（仅限机器人所有者）"""
+        objects = profiler.count_live_objects()
+        tasks = profiler.count_tasks()
+        path = profiler.write_objects_report(objects, tasks)
+        lines = [f'{name}: {count}' for name, count in objects.most_common()] or ['（无）']
+        lines.append(f'任务: {sum(tasks.values())}')
+        lines.extend(f'  {name}: {count}' for name, count in tasks.most_common(5))
+        await ctx.send(f'🧩 存活对象（完整报告: `{path}`）\n```\n' + '\n'.join(lines)[:1800] + '\n```')
 
 async def setup(bot):
     config_manager = getattr(bot, 'config_manager', None)
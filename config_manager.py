@@ -1,8 +1,28 @@
 import configparser
 import os
 from data_manager import DataManager
+from sqlite_data_manager import SQLiteDataManager
+from application_store import ApplicationStore
 from typing import Optional, List
 
+# 热重载时不在日志中显示的配置项
+SECRET_OPTIONS = {('bot', 'token')}
+
+def diff_config(old: configparser.ConfigParser, new: configparser.ConfigParser) -> List[tuple]:
+    """比较两份配置，返回 [(节.键, 旧值, 新值)]，不存在的项为 None"""
+    changes = []
+    for section in sorted(set(old.sections()) | set(new.sections())):
+        old_items = dict(old.items(section)) if old.has_section(section) else {}
+        new_items = dict(new.items(section)) if new.has_section(section) else {}
+        for key in sorted(set(old_items) | set(new_items)):
+            old_value, new_value = old_items.get(key), new_items.get(key)
+            if old_value == new_value:
+                continue
+            if (section, key) in SECRET_OPTIONS:
+                old_value, new_value = '***', '***'
+            changes.append((f'{section}.{key}', old_value, new_value))
+    return changes
+
 class ConfigManager:
     def __init__(self, config_path: str = 'config.cfg'):
         self.config_path = config_path
@@ -15,7 +35,58 @@ class ConfigManager:
         self.config.read(config_path, encoding='utf-8')
         
         # 数据管理器
-        self.data_manager = DataManager()
+        backend, db_path = self.get_database_config()
+        if backend == 'sqlite':
+            self.data_manager = SQLiteDataManager(db_path)
+        else:
+            write_behind, flush_interval = self.get_storage_config()
+            journal, compact_interval, compact_size = self.get_journal_config()
+            self.data_manager = DataManager(write_behind=write_behind, flush_interval=flush_interval, journal=journal,
+                                            compact_interval=compact_interval, compact_size=compact_size)
+        
+        # 验证申请记录
+        self.application_store = ApplicationStore(db_path)
+    
+    def reload_config(self) -> List[tuple]:
+        """重新读取配置文件，校验通过后替换当前配置
+        
+        返回变化的配置项列表 [(节.键, 旧值, 新值)]；文件无效时抛出 ValueError，当前配置保持不变。
+        """
+        parser = configparser.ConfigParser()
+        try:
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                parser.read_file(f)
+        except (OSError, configparser.Error) as e:
+            raise ValueError(f'无法解析配置文件: {e}')
+        
+        previous = self.config
+        self.config = parser
+        try:
+            self.validate_config()
+        except (ValueError, KeyError) as e:
+            self.config = previous
+            raise ValueError(f'配置无效: {e}')
+        return diff_config(previous, parser)
+    
+    def validate_config(self):
+        """读取全部配置项，格式错误时抛出 ValueError 或 KeyError"""
+        if not self.config.get('bot', 'token', fallback='').strip():
+            raise ValueError('[bot] token 不能为空')
+        self.get_activity_config()
+        self.get_logging_config()
+        self.get_metrics_config()
+        self.get_shard_config()
+        self.get_command_sync_config()
+        self.get_cluster_processes()
+        self.get_database_config()
+        self.get_storage_config()
+        self.get_journal_config()
+        self.get_queue_config()
+        self.get_admission_config()
+        self.get_performance_config()
+        self.get_reconcile_config()
+        self.get_reload_config()
+        self.get_expiry_config()
     
     def create_default_config(self):
         """创建默认配置文件"""
@@ -24,11 +95,96 @@ token=YOUR_BOT_TOKEN_HERE
 description=Discord验证机器人
 activity_type=playing
 activity_name=验证管理
+# 分片模式（AutoShardedBot），大量服务器时启用
+sharded=false
+# 分片总数，留空则由 Discord 推荐
+shard_count=
+
+[commands]
+# 启动时同步斜杠命令：auto（命令变化时才同步）、always、never
+sync_mode=auto
+# 开发用服务器ID，设置后只同步到该服务器（立即生效）
+dev_guild_id=
+
+[cluster]
+# 多进程模式下的工作进程数，分片平均分配到各进程（需要 backend=sqlite）
+processes=1
+
+[logging]
+# 日志文件使用 JSON Lines 格式（包含 guild_id / user_id / latency_ms 字段）
+json_format=false
+# 日志文件保留天数
+retention_days=14
+# 高频 INFO 日志的采样比例（0-1）
+info_sample_rate=1.0
+
+[metrics]
+# 本地 Prometheus 指标端点（/metrics）
+enabled=false
+host=127.0.0.1
+port=9100
 
 [database]
+# 存储后端：json 或 sqlite（首次使用 sqlite 时会自动导入 server_data.json）
+backend=json
 # 数据库文件路径
 db_path=verification.db
 
+[storage]
+# JSON 后端延迟写入：修改先更新内存，由后台任务按间隔合并写入磁盘
+write_behind=true
+# 合并写入间隔（秒）
+flush_interval=2.0
+# 日志存储：每次修改追加到 server_data.json.journal 并立即同步到磁盘，启用后优先于延迟写入
+journal=true
+# 日志合并进 server_data.json 的间隔（秒）和日志大小上限（字节）
+compact_interval=300
+compact_size=1048576
+
+[queue]
+# 出站请求（分配身份组、私信等）的并发数和重试次数
+concurrency=4
+max_retries=3
+# 每个服务器每秒分配身份组次数、全局每秒私信次数
+role_rate=5
+dm_rate=1
+
+[admission]
+# 同一用户两次申请之间的冷却时间（秒）
+cooldown=300
+# 每个服务器每分钟最多发送的审核卡片数，超出的申请进入队列
+per_minute=20
+
+[reconcile]
+# 后台核对已通过的申请与验证身份组持有者
+enabled=true
+# 核对间隔（秒）、每个服务器每次核对的记录数、每轮最多调用 API 的次数
+interval=300
+chunk_size=50
+api_budget=20
+# 发现缺少身份组时自动补发（默认只统计）
+repair=false
+
+[expiry]
+# 待审核申请超过服务器设置的有效期（/申请有效期）后自动关闭
+enabled=true
+# 重新扫描待审核申请的间隔（秒）、每批关闭的申请数
+rescan_interval=300
+batch_size=25
+
+[reload]
+# 热重载：定期检查 config.cfg 和 server_data.json，修改后无需重启即可生效
+enabled=true
+# 检查间隔（秒）
+interval=2.0
+
+[performance]
+# 低内存模式：启动时不拉取成员列表，只缓存最近交互的成员
+low_memory=false
+# 成员缓存容量与有效期（秒）
+member_cache_size=1000
+member_cache_ttl=300
+
 [default_settings]
 # 默认配置 - 可通过斜杠命令修改
 review_channel_id=
@@ -64,6 +220,108 @@ admin_role_ids=
         activity_name = self.config['bot']['activity_name']
         return activity_type, activity_name
     
+    def get_logging_config(self) -> dict:
+        """获取日志配置"""
+        return {
+            'json_format': self.config.getboolean('logging', 'json_format', fallback=False),
+            'retention_days': self.config.getint('logging', 'retention_days', fallback=14),
+            'info_sample_rate': self.config.getfloat('logging', 'info_sample_rate', fallback=1.0),
+        }
+    
+    def get_metrics_config(self) -> tuple:
+        """获取指标端点配置"""
+        enabled = self.config.getboolean('metrics', 'enabled', fallback=False)
+        host = self.config.get('metrics', 'host', fallback='127.0.0.1').strip() or '127.0.0.1'
+        port = self.config.getint('metrics', 'port', fallback=9100)
+        return enabled, host, port
+    
+    def get_shard_config(self) -> tuple:
+        """获取分片配置"""
+        sharded = self.config.getboolean('bot', 'sharded', fallback=False)
+        shard_count = self.config.get('bot', 'shard_count', fallback='').strip()
+        return sharded, int(shard_count) if shard_count else None
+    
+    def get_command_sync_config(self) -> tuple:
+        """获取斜杠命令同步配置"""
+        mode = self.config.get('commands', 'sync_mode', fallback='auto').strip().lower()
+        dev_guild_id = self.config.get('commands', 'dev_guild_id', fallback='').strip()
+        return mode, int(dev_guild_id) if dev_guild_id else None
+    
+    def get_cluster_processes(self) -> int:
+        """获取多进程模式的工作进程数"""
+        return max(1, self.config.getint('cluster', 'processes', fallback=1))
+    
+    def get_database_config(self) -> tuple:
+        """获取数据库配置"""
+        backend = self.config.get('database', 'backend', fallback='json').strip().lower()
+        db_path = self.config.get('database', 'db_path', fallback='verification.db').strip() or 'verification.db'
+        return backend, db_path
+    
+    def get_storage_config(self) -> tuple:
+        """获取数据存储配置"""
+        write_behind = self.config.getboolean('storage', 'write_behind', fallback=False)
+        flush_interval = self.config.getfloat('storage', 'flush_interval', fallback=2.0)
+        return write_behind, flush_interval
+    
+    def get_journal_config(self) -> tuple:
+        """获取日志存储配置"""
+        journal = self.config.getboolean('storage', 'journal', fallback=False)
+        compact_interval = self.config.getfloat('storage', 'compact_interval', fallback=300.0)
+        compact_size = self.config.getint('storage', 'compact_size', fallback=1048576)
+        return journal, max(1.0, compact_interval), max(1024, compact_size)
+    
+    def get_queue_config(self) -> dict:
+        """获取出站请求队列配置"""
+        role_rate = self.config.getfloat('queue', 'role_rate', fallback=5.0)
+        dm_rate = self.config.getfloat('queue', 'dm_rate', fallback=1.0)
+        return {
+            'concurrency': self.config.getint('queue', 'concurrency', fallback=4),
+            'max_retries': self.config.getint('queue', 'max_retries', fallback=3),
+            'routes': {
+                'add_roles': (role_rate, max(1, int(role_rate)), True),
+                'edit_member': (role_rate, max(1, int(role_rate)), True),
+                'dm': (dm_rate, 5, False),
+            }
+        }
+    
+    def get_admission_config(self) -> dict:
+        """获取申请准入控制配置"""
+        return {
+            'cooldown': self.config.getfloat('admission', 'cooldown', fallback=300.0),
+            'per_minute': self.config.getint('admission', 'per_minute', fallback=20),
+        }
+    
+    def get_reconcile_config(self) -> tuple:
+        """获取身份组核对配置，返回 (是否启用, RoleReconciler 参数)"""
+        enabled = self.config.getboolean('reconcile', 'enabled', fallback=True)
+        return enabled, {
+            'interval': max(10.0, self.config.getfloat('reconcile', 'interval', fallback=300.0)),
+            'chunk_size': max(1, self.config.getint('reconcile', 'chunk_size', fallback=50)),
+            'api_budget': max(0, self.config.getint('reconcile', 'api_budget', fallback=20)),
+            'repair': self.config.getboolean('reconcile', 'repair', fallback=False),
+        }
+    
+    def get_expiry_config(self) -> tuple:
+        """获取申请过期配置，返回 (是否启用, ExpiryScheduler 参数)"""
+        enabled = self.config.getboolean('expiry', 'enabled', fallback=True)
+        return enabled, {
+            'rescan_interval': max(10.0, self.config.getfloat('expiry', 'rescan_interval', fallback=300.0)),
+            'batch_size': max(1, self.config.getint('expiry', 'batch_size', fallback=25)),
+        }
+    
+    def get_reload_config(self) -> tuple:
+        """获取热重载配置"""
+        enabled = self.config.getboolean('reload', 'enabled', fallback=True)
+        interval = self.config.getfloat('reload', 'interval', fallback=2.0)
+        return enabled, max(0.5, interval)
+    
+    def get_performance_config(self) -> tuple:
+        """获取性能相关配置"""
+        low_memory = self.config.getboolean('performance', 'low_memory', fallback=False)
+        cache_size = self.config.getint('performance', 'member_cache_size', fallback=1000)
+        cache_ttl = self.config.getfloat('performance', 'member_cache_ttl', fallback=300.0)
+        return low_memory, cache_size, cache_ttl
+    
     def set_server_config(self, guild_id: int, **kwargs):
         """设置服务器配置"""
         return self.data_manager.update_server_config(guild_id, **kwargs)
@@ -88,6 +346,22 @@ admin_role_ids=
         """检查用户是否为管理员"""
         return self.data_manager.is_admin(user_roles, guild_id)
     
+    def get_review_mode(self, guild_id: int) -> tuple:
+        """获取审核模式和汇总间隔"""
+        return self.data_manager.get_review_mode(guild_id)
+    
+    def get_outcome_roles(self, guild_id: int) -> tuple:
+        """获取审核通过时添加和移除的身份组ID"""
+        return self.data_manager.get_outcome_roles(guild_id)
+    
+    def get_expire_after(self, guild_id: int) -> Optional[float]:
+        """获取待审核申请的有效期（秒）"""
+        return self.data_manager.get_expire_after(guild_id)
+    
+    def get_auto_rules(self, guild_id: int):
+        """获取自动通过规则"""
+        return self.data_manager.get_auto_rules(guild_id)
+    
     def is_config_complete(self, guild_id: int) -> bool:
         """检查配置是否完整"""
         return self.data_manager.is_config_complete(guild_id)
\ No newline at end of file
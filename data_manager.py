@@ -1,33 +1,397 @@
+import asyncio
 import json
 import os
+import tempfile
+import time
 from typing import Optional, Dict, Any
 from datetime import datetime
+from auto_approval import AutoApprovalRules, DISABLED_RULES
+from logger import get_logger
+
+logger = get_logger('data')
+
+def _to_int(value) -> Optional[int]:
+    """将存储的ID转换为整数，无效值返回 None"""
+    try:
+        return int(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+def _to_id_tuple(value) -> tuple:
+    """将存储的ID列表（或旧格式的逗号分隔字符串）转换为去重后的整数元组"""
+    if isinstance(value, str):
+        # 兼容旧格式
+        value = value.split(',')
+    elif not isinstance(value, list):
+        value = []
+    parsed = (_to_int(str(item).strip()) for item in value)
+    return tuple(dict.fromkeys(item for item in parsed if item))
+
+class GuildConfig:
+    """预编译的服务器配置快照，读取时无需再解析和转换"""
+    __slots__ = ('review_channel_id', 'verified_role_id', 'admin_role_ids', 'admin_role_set', 'complete',
+                 'review_mode', 'digest_window', 'auto_rules', 'outcome_add_ids', 'outcome_remove_ids', 'expire_after')
+    
+    def __init__(self, config: Dict[str, Any]):
+        self.review_channel_id: Optional[int] = _to_int(config.get('review_channel_id'))
+        self.verified_role_id: Optional[int] = _to_int(config.get('verified_role_id'))
+        
+        self.admin_role_ids: tuple = _to_id_tuple(config.get('admin_role_ids', []))
+        self.admin_role_set: frozenset = frozenset(self.admin_role_ids)
+        
+        self.complete: bool = bool(self.review_channel_id and self.verified_role_id and self.admin_role_ids)
+        
+        # 审核模式：card 每个申请一张卡片，digest 定期汇总为一条消息
+        self.review_mode: str = 'digest' if config.get('review_mode') == 'digest' else 'card'
+        self.digest_window: float = float(config.get('digest_window') or 60)
+        
+        # 审核通过时添加和移除的身份组（验证身份组总是添加）
+        extra_ids = _to_id_tuple(config.get('extra_role_ids', []))
+        self.outcome_add_ids: tuple = tuple(dict.fromkeys(
+            ((self.verified_role_id,) if self.verified_role_id else ()) + extra_ids
+        ))
+        self.outcome_remove_ids: tuple = tuple(
+            role_id for role_id in _to_id_tuple(config.get('remove_role_ids', [])) if role_id not in self.outcome_add_ids
+        )
+        
+        # 待审核申请的有效期（秒），未设置时不过期
+        try:
+            expire_hours = float(config.get('expire_hours') or 0)
+        except (TypeError, ValueError):
+            expire_hours = 0
+        self.expire_after: Optional[float] = expire_hours * 3600 if expire_hours > 0 else None
+        
+        # 自动通过规则，在配置变化时编译一次
+        auto_approve = config.get('auto_approve')
+        self.auto_rules: AutoApprovalRules = AutoApprovalRules(auto_approve) if auto_approve else DISABLED_RULES
+
+EMPTY_GUILD_CONFIG = GuildConfig({})
+
+class DataCorruptionError(Exception):
+    """数据文件或日志损坏；拒绝以空配置启动，避免覆盖全部服务器的配置"""
 
 class DataManager:
-    def __init__(self, data_file: str = 'server_data.json'):
+    # 是否支持从数据文件热重载（SQLite 后端自行同步其他进程的修改）
+    reloadable = True
+    
+    def __init__(self, data_file: str = 'server_data.json', write_behind: bool = False, flush_interval: float = 2.0,
+                 journal: bool = False, compact_interval: float = 300.0, compact_size: int = 1048576):
         self.data_file = data_file
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        stage = time.perf_counter()
         self.data = self.load_data()
+        
+        # 追加日志：每次修改追加一行并 fsync，后台定期合并进快照文件
+        self.journal = journal
+        self.journal_file = data_file + '.journal'
+        self.compact_interval = compact_interval
+        self.compact_size = compact_size
+        self._journal_fp = None
+        self._journal_size = 0
+        self._last_compact = time.monotonic()
+        if journal:
+            self._open_journal()
+        # 加载数据文件和重放日志的耗时，用于启动报告
+        self.load_seconds = time.perf_counter() - stage
+        
+        # 每个服务器的配置快照，在加载和修改时重建
+        self._snapshots: Dict[int, GuildConfig] = {}
+        self.rebuild_snapshots()
+        
+        # 延迟写入状态
+        self._dirty = False
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.last_flush_stats: Dict[str, Any] = {}
+        # 最近一次由本进程写入的文件修改时间，热重载据此忽略自己的写入
+        self.last_write_mtime: Optional[int] = None
     
     def load_data(self) -> Dict[str, Any]:
-        """加载数据文件"""
-        if os.path.exists(self.data_file):
+        """加载数据文件
+        
+        文件不存在时返回空配置；文件存在但为空或损坏时抛出 DataCorruptionError。
+        """
+        if not os.path.exists(self.data_file):
+            return {}
+        try:
+            with open(self.data_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise DataCorruptionError(f'{self.data_file} 无法解析: {e}')
+        if not isinstance(data, dict):
+            raise DataCorruptionError(f'{self.data_file} 顶层必须是对象')
+        return data
+    
+    def _read_journal(self) -> tuple:
+        """读取日志，返回 (修改列表, 有效字节数)
+        
+        最后一行没有换行符说明追加时进程中断，该修改未完成，予以丢弃；
+        其他行损坏时抛出 DataCorruptionError。
+        """
+        if not os.path.exists(self.journal_file):
+            return [], 0
+        with open(self.journal_file, 'rb') as f:
+            content = f.read()
+        
+        lines = content.split(b'\n')
+        torn = lines.pop()
+        if torn:
+            logger.warning(f"{self.journal_file} 末尾有未写完的记录（{len(torn)} 字节），已丢弃")
+        
+        entries = []
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
             try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, FileNotFoundError):
-                return {}
-        return {}
+                entry = json.loads(line)
+                if entry['op'] not in ('set', 'delete') or not isinstance(entry['guild'], str):
+                    raise ValueError(f"未知操作 {entry['op']!r}")
+                if entry['op'] == 'set' and not isinstance(entry['config'], dict):
+                    raise ValueError('配置必须是对象')
+            except (ValueError, KeyError, TypeError) as e:
+                raise DataCorruptionError(f'{self.journal_file} 第 {number} 行损坏: {e}')
+            entries.append(entry)
+        return entries, len(content) - len(torn)
+    
+    @staticmethod
+    def _apply_journal(data: Dict[str, Any], entries: list):
+        """按顺序将日志中的修改应用到 data"""
+        for entry in entries:
+            if entry['op'] == 'set':
+                data[entry['guild']] = entry['config']
+            else:
+                data.pop(entry['guild'], None)
+    
+    def _open_journal(self):
+        """重放日志并打开以供追加"""
+        entries, valid_size = self._read_journal()
+        self._apply_journal(self.data, entries)
+        if entries:
+            logger.info(f"已从 {self.journal_file} 重放 {len(entries)} 条修改")
+        
+        self._journal_fp = open(self.journal_file, 'ab')
+        # 截掉未写完的记录，避免新记录接在残缺行后面
+        if self._journal_fp.tell() != valid_size:
+            self._journal_fp.truncate(valid_size)
+        self._journal_size = valid_size
+    
+    def _append_journal(self, entry: Dict[str, Any]) -> bool:
+        """追加一条修改记录并同步到磁盘"""
+        line = (json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        try:
+            self._journal_fp.write(line)
+            self._journal_fp.flush()
+            os.fsync(self._journal_fp.fileno())
+        except OSError as e:
+            logger.error(f"写入日志失败: {e}")
+            return False
+        self._journal_size += len(line)
+        return True
+    
+    def _rewrite_journal(self, offset: int):
+        """合并后只保留 offset 之后追加的记录"""
+        self._journal_fp.close()
+        with open(self.journal_file, 'rb') as f:
+            f.seek(offset)
+            remaining = f.read()
+        
+        directory = os.path.dirname(os.path.abspath(self.journal_file))
+        fd, tmp_path = tempfile.mkstemp(prefix='.server_data.', suffix='.journal.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(remaining)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.journal_file)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            self._journal_fp = open(self.journal_file, 'ab')
+            self._journal_size = self._journal_fp.tell()
+    
+    def reload_data(self) -> Dict[str, list]:
+        """重新读取数据文件并整体替换内存中的配置
+        
+        文件无法解析或格式不正确时抛出 ValueError，内存中的配置保持不变。
+        返回新增、删除和修改的服务器ID。
+        """
+        try:
+            with open(self.data_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise ValueError(f'无法读取数据文件: {e}')
+        if not isinstance(data, dict):
+            raise ValueError('数据文件顶层必须是对象')
+        if self.journal:
+            # 快照之后的修改仍以日志为准
+            try:
+                self._apply_journal(data, self._read_journal()[0])
+            except DataCorruptionError as e:
+                raise ValueError(str(e))
+        
+        snapshots = {}
+        for guild_key, config in data.items():
+            guild_id = _to_int(guild_key)
+            if not guild_id or not isinstance(config, dict):
+                raise ValueError(f'服务器 {guild_key} 的配置格式不正确')
+            try:
+                snapshots[guild_id] = GuildConfig(config)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f'服务器 {guild_key} 的配置无效: {e}')
+        
+        if self._dirty:
+            logger.warning("数据文件被外部修改，尚未写入的内存修改已被覆盖")
+        
+        previous = self.data
+        self.data = data
+        self._snapshots = snapshots
+        self._dirty = False
+        return {
+            'added': sorted(key for key in data if key not in previous),
+            'removed': sorted(key for key in previous if key not in data),
+            'changed': sorted(key for key in data if key in previous and data[key] != previous[key]),
+        }
+    
+    def _write_file(self, payload: str):
+        """原子写入：先写临时文件，再替换原文件"""
+        directory = os.path.dirname(os.path.abspath(self.data_file))
+        fd, tmp_path = tempfile.mkstemp(prefix='.server_data.', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.data_file)
+            self.last_write_mtime = os.stat(self.data_file).st_mtime_ns
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
     
     def save_data(self) -> bool:
         """保存数据到文件"""
+        if self.write_behind:
+            # 延迟写入模式下只标记脏数据，由后台任务合并写入
+            self._dirty = True
+            return True
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, ensure_ascii=False, indent=2)
+            self._write_file(json.dumps(self.data, ensure_ascii=False, separators=(',', ':')))
             return True
         except Exception as e:
-            print(f"保存数据失败: {e}")
+            logger.error(f"保存数据失败: {e}")
             return False
     
+    def _snapshot(self) -> Dict[str, Any]:
+        """在事件循环中复制一份数据快照，供后台线程序列化"""
+        return {key: dict(value) if isinstance(value, dict) else value for key, value in self.data.items()}
+    
+    async def flush(self) -> bool:
+        """将内存中的修改写入磁盘（在线程池中序列化与写文件）"""
+        async with self._flush_lock:
+            if not self._dirty:
+                return True
+            self._dirty = False
+            snapshot = self._snapshot()
+            start = time.perf_counter()
+            try:
+                payload = await asyncio.to_thread(json.dumps, snapshot, ensure_ascii=False, separators=(',', ':'))
+                await asyncio.to_thread(self._write_file, payload)
+            except Exception as e:
+                # 写入失败时保留脏标记，下个周期重试
+                self._dirty = True
+                logger.error(f"保存数据失败: {e}")
+                return False
+            except BaseException:
+                self._dirty = True
+                raise
+            
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            size = len(payload.encode('utf-8'))
+            self.last_flush_stats = {
+                'latency_ms': round(elapsed_ms, 2),
+                'size_bytes': size,
+                'guilds': len(snapshot),
+                'flushed_at': datetime.now().isoformat()
+            }
+            logger.debug(f"数据已写入磁盘: {len(snapshot)} 个服务器, {size} 字节, 耗时 {elapsed_ms:.2f}ms")
+            return True
+    
+    async def _flush_loop(self):
+        """后台定时合并写入"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+    
+    async def compact(self) -> bool:
+        """将日志中的修改合并进快照文件，并清空已合并的日志"""
+        async with self._flush_lock:
+            if not self._journal_size:
+                return True
+            # 快照与日志偏移在同一时刻取得，合并期间追加的修改保留在日志中
+            snapshot = self._snapshot()
+            offset = self._journal_size
+            start = time.perf_counter()
+            try:
+                payload = await asyncio.to_thread(json.dumps, snapshot, ensure_ascii=False, separators=(',', ':'))
+                await asyncio.to_thread(self._write_file, payload)
+                self._rewrite_journal(offset)
+            except Exception as e:
+                logger.error(f"合并日志失败: {e}")
+                return False
+            self._last_compact = time.monotonic()
+            
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            size = len(payload.encode('utf-8'))
+            self.last_flush_stats = {
+                'latency_ms': round(elapsed_ms, 2),
+                'size_bytes': size,
+                'guilds': len(snapshot),
+                'journal_bytes': offset,
+                'flushed_at': datetime.now().isoformat()
+            }
+            logger.debug(f"日志已合并: {offset} 字节日志, {len(snapshot)} 个服务器, 耗时 {elapsed_ms:.2f}ms")
+            return True
+    
+    async def _compact_loop(self):
+        """日志超过大小上限或距上次合并超过间隔时合并"""
+        while True:
+            await asyncio.sleep(min(self.compact_interval, 10.0))
+            if (self._journal_size >= self.compact_size
+                    or time.monotonic() - self._last_compact >= self.compact_interval):
+                await self.compact()
+    
+    def start(self):
+        """启动后台写入任务（需在事件循环中调用）"""
+        if self._flush_task is not None:
+            return
+        if self.journal:
+            self._flush_task = asyncio.create_task(self._compact_loop())
+            logger.info(f"已启用日志存储，合并间隔 {self.compact_interval} 秒")
+        elif self.write_behind:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+            logger.info(f"已启用延迟写入模式，写入间隔 {self.flush_interval} 秒")
+    
+    async def close(self):
+        """停止后台任务并写入剩余修改"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        if self._journal_fp is not None:
+            await self.compact()
+            self._journal_fp.close()
+            self._journal_fp = None
+        if self._dirty:
+            await self.flush()
+            stats = self.last_flush_stats
+            logger.info(f"关闭前已写入数据: {stats.get('size_bytes', 0)} 字节, 耗时 {stats.get('latency_ms', 0)}ms")
+    
     def get_server_config(self, guild_id: int) -> Dict[str, Any]:
         """获取服务器配置"""
         guild_key = str(guild_id)
@@ -42,60 +406,89 @@ class DataManager:
         self.data[guild_key].update(config)
         self.data[guild_key]['updated_at'] = datetime.now().isoformat()
         
+        if self.journal:
+            return self._append_journal({'op': 'set', 'guild': guild_key, 'config': self.data[guild_key]})
         return self.save_data()
     
+    def rebuild_snapshots(self):
+        """根据当前数据重建全部配置快照"""
+        snapshots = {}
+        for guild_key, config in self.data.items():
+            guild_id = _to_int(guild_key)
+            if guild_id and isinstance(config, dict):
+                snapshots[guild_id] = GuildConfig(config)
+        self._snapshots = snapshots
+    
+    def _refresh_snapshot(self, guild_id: int):
+        """重建单个服务器的配置快照"""
+        config = self.data.get(str(guild_id))
+        if config:
+            self._snapshots[int(guild_id)] = GuildConfig(config)
+        else:
+            self._snapshots.pop(int(guild_id), None)
+    
+    def get_snapshot(self, guild_id: int) -> GuildConfig:
+        """获取服务器配置快照"""
+        return self._snapshots.get(guild_id, EMPTY_GUILD_CONFIG)
+    
     def update_server_config(self, guild_id: int, **kwargs) -> bool:
         """更新服务器配置"""
-        config = self.get_server_config(guild_id)
+        config = dict(self.get_server_config(guild_id))
         for key, value in kwargs.items():
-            if key in ['review_channel_id', 'verified_role_id', 'admin_role_ids']:
+            if key in ['review_channel_id', 'verified_role_id', 'admin_role_ids', 'review_mode', 'digest_window', 'auto_approve',
+                       'extra_role_ids', 'remove_role_ids', 'expire_hours']:
                 config[key] = value
         
-        return self.set_server_config(guild_id, config)
+        success = self.set_server_config(guild_id, config)
+        self._refresh_snapshot(guild_id)
+        return success
     
     def get_review_channel_id(self, guild_id: int) -> Optional[int]:
         """获取审核频道ID"""
-        config = self.get_server_config(guild_id)
-        channel_id = config.get('review_channel_id')
-        return int(channel_id) if channel_id else None
+        return self.get_snapshot(guild_id).review_channel_id
     
     def get_verified_role_id(self, guild_id: int) -> Optional[int]:
         """获取验证身份组ID"""
-        config = self.get_server_config(guild_id)
-        role_id = config.get('verified_role_id')
-        return int(role_id) if role_id else None
+        return self.get_snapshot(guild_id).verified_role_id
     
     def get_admin_role_ids(self, guild_id: int) -> list:
         """获取管理员身份组ID列表"""
-        config = self.get_server_config(guild_id)
-        admin_ids = config.get('admin_role_ids', [])
-        if isinstance(admin_ids, str):
-            # 兼容旧格式
-            return [int(id.strip()) for id in admin_ids.split(',') if id.strip()]
-        elif isinstance(admin_ids, list):
-            return [int(id) for id in admin_ids if id]
-        return []
-    
-    def is_admin(self, user_roles: list, guild_id: int) -> bool:
+        return list(self.get_snapshot(guild_id).admin_role_ids)
+    
+    def is_admin(self, user_roles, guild_id: int) -> bool:
         """检查用户是否为管理员"""
-        admin_role_ids = self.get_admin_role_ids(guild_id)
-        if not admin_role_ids:
-            return False
-        return any(role_id in admin_role_ids for role_id in user_roles)
+        admin_role_set = self.get_snapshot(guild_id).admin_role_set
+        return bool(admin_role_set) and not admin_role_set.isdisjoint(user_roles)
+    
+    def get_review_mode(self, guild_id: int) -> tuple:
+        """获取审核模式和汇总间隔（秒）"""
+        snapshot = self.get_snapshot(guild_id)
+        return snapshot.review_mode, snapshot.digest_window
+    
+    def get_outcome_roles(self, guild_id: int) -> tuple:
+        """获取审核通过时添加和移除的身份组ID"""
+        snapshot = self.get_snapshot(guild_id)
+        return snapshot.outcome_add_ids, snapshot.outcome_remove_ids
+    
+    def get_expire_after(self, guild_id: int) -> Optional[float]:
+        """获取待审核申请的有效期（秒），不过期时返回 None"""
+        return self.get_snapshot(guild_id).expire_after
+    
+    def get_auto_rules(self, guild_id: int) -> AutoApprovalRules:
+        """获取自动通过规则"""
+        return self.get_snapshot(guild_id).auto_rules
     
     def is_config_complete(self, guild_id: int) -> bool:
         """检查配置是否完整"""
-        config = self.get_server_config(guild_id)
-        return all([
-            config.get('review_channel_id'),
-            config.get('verified_role_id'),
-            config.get('admin_role_ids')
-        ])
+        return self.get_snapshot(guild_id).complete
     
     def delete_server_config(self, guild_id: int) -> bool:
         """删除服务器配置"""
         guild_key = str(guild_id)
         if guild_key in self.data:
             del self.data[guild_key]
+            self._refresh_snapshot(guild_id)
+            if self.journal:
+                return self._append_journal({'op': 'delete', 'guild': guild_key})
             return self.save_data()
-        return True
\ No newline at end of file
+        return True
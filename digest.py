@@ -0,0 +1,269 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import List, Optional
+import discord
+from job_queue import PRIORITY_MESSAGE
+from metrics import instrument
+from verification_views import approve_application, claim_application, finish_claim
+from logger import get_logger
+
+logger = get_logger('digest')
+
+# 每页显示的申请数（也是每个下拉菜单的选项数）
+PAGE_SIZE = 10
+# 每条汇总消息最多包含的申请数
+DIGEST_CAPACITY = 50
+
+STATUS_ICONS = {
+    'pending': '⏳',
+    'processing': '🔄',
+    'approved': '✅',
+    'rejected': '❌',
+    'expired': '⌛',
+}
+
+def page_count(applications: list) -> int:
+    return max(1, (len(applications) + PAGE_SIZE - 1) // PAGE_SIZE)
+
+def build_digest_embed(applications: List[dict], page: int) -> discord.Embed:
+    """构建汇总消息的一页"""
+    pages = page_count(applications)
+    entries = applications[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+    pending = sum(1 for application in applications if application['status'] == 'pending')
+    
+    lines = []
+    now = time.time()
+    for index, application in enumerate(entries, start=page * PAGE_SIZE + 1):
+        icon = STATUS_ICONS.get(application['status'], '❔')
+        created_at = application['account_created_at']
+        age = f'账号 {int((now - created_at) // 86400)} 天' if created_at else '账号年龄未知'
+        reason = application['reason'] or ''
+        if len(reason) > 120:
+            reason = reason[:117] + '...'
+        lines.append(f'{icon} **#{index}** <@{application["user_id"]}> · {age}\n> {reason}')
+    
+    embed = discord.Embed(
+        title='🗂️ 验证申请汇总',
+        description='\n'.join(lines) or '没有申请',
+        color=discord.Color.blue() if pending else discord.Color.green(),
+        timestamp=datetime.now()
+    )
+    embed.set_footer(text=f'第 {page + 1}/{pages} 页 · 共 {len(applications)} 个申请，待审核 {pending} 个')
+    return embed
+
+class DigestView(discord.ui.View):
+    """汇总消息的组件，仅在发送或翻页时构建；交互由动态组件统一处理"""
+    def __init__(self, applications: List[dict], page: int):
+        super().__init__(timeout=None)
+        pages = page_count(applications)
+        entries = applications[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+        pending = [
+            (index, application)
+            for index, application in enumerate(entries, start=page * PAGE_SIZE + 1)
+            if application['status'] == 'pending'
+        ]
+        self.add_item(DigestSelect('approve', page, pending))
+        self.add_item(DigestSelect('reject', page, pending))
+        if pages > 1:
+            self.add_item(DigestPageButton(max(page - 1, 0), 'prev', disabled=page == 0))
+            self.add_item(DigestPageButton(min(page + 1, pages - 1), 'next', disabled=page >= pages - 1))
+
+def _select_options(pending: list) -> List[discord.SelectOption]:
+    options = []
+    for index, application in pending:
+        reason = (application['reason'] or '').replace('\n', ' ')
+        options.append(discord.SelectOption(
+            label=f'#{index} 用户 {application["user_id"]}',
+            value=str(application['id']),
+            description=reason[:100] or None
+        ))
+    return options
+
+class DigestSelect(discord.ui.DynamicItem[discord.ui.Select], template=r'digest:(?P<action>approve|reject):(?P<page>[0-9]+)'):
+    """汇总消息中的批量通过/拒绝下拉菜单"""
+    def __init__(self, action: str, page: int, pending: Optional[list] = None, options: Optional[list] = None):
+        if options is None:
+            options = _select_options(pending or [])
+        disabled = not options
+        if disabled:
+            # Discord 要求下拉菜单至少有一个选项
+            options = [discord.SelectOption(label='无待审核申请', value='none')]
+        placeholder = '选择要通过的申请' if action == 'approve' else '选择要拒绝的申请'
+        select = discord.ui.Select(
+            custom_id=f'digest:{action}:{page}',
+            placeholder=placeholder,
+            min_values=1,
+            max_values=len(options),
+            options=options,
+            disabled=disabled
+        )
+        super().__init__(select)
+        self.action = action
+        self.page = page
+    
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Select, match):
+        return cls(match['action'], int(match['page']), options=item.options)
+    
+    @instrument('digest_select')
+    async def callback(self, interaction: discord.Interaction):
+        bot = interaction.client
+        config_manager = bot.config_manager
+        user_roles = [role.id for role in interaction.user.roles]
+        if not config_manager.is_admin(user_roles, interaction.guild.id):
+            await interaction.response.send_message('❌ 你没有权限执行此操作！', ephemeral=True)
+            return
+        
+        # 先确认交互，再执行耗时的审核操作
+        await interaction.response.defer()
+        
+        store = config_manager.application_store
+        message_id = interaction.message.id
+        selected = [int(value) for value in self.item.values if value.isdigit()]
+        applications = []
+        skipped = 0
+        for application_id in selected:
+            application = store.get(application_id)
+            if not application or application['digest_message_id'] != message_id:
+                continue
+            # 与其他审核者同时操作时，每个申请只由认领成功的一方处理
+            if claim_application(store, application_id, interaction.user.id) is not None:
+                skipped += 1
+                continue
+            applications.append(application)
+        
+        errors = []
+        processed = 0
+        try:
+            if self.action == 'approve':
+                results = await asyncio.gather(*[
+                    approve_application(bot, interaction.guild, application['user_id'], application['id'], interaction.user.id)
+                    for application in applications
+                ])
+                for application, result in zip(applications, results):
+                    finish_claim(store, application['id'], decided=not result.error)
+                    if result.error:
+                        errors.append(result.error)
+                    else:
+                        processed += 1
+            else:
+                for application in applications:
+                    store.set_status(application['id'], 'rejected', interaction.user.id)
+                    finish_claim(store, application['id'], decided=True)
+                    processed += 1
+        except BaseException:
+            for application in applications:
+                finish_claim(store, application['id'], decided=False)
+            raise
+        if skipped:
+            errors.append(f'{skipped} 个申请已由其他审核者处理')
+        
+        action_name = '通过' if self.action == 'approve' else '拒绝'
+        logger.info(f"汇总审核: {interaction.user} {action_name}了 {processed} 个申请",
+                    extra={'guild_id': interaction.guild.id, 'user_id': interaction.user.id})
+        
+        # 重新渲染当前页
+        applications = store.list_by_digest(message_id)
+        page = min(self.page, page_count(applications) - 1)
+        try:
+            await interaction.edit_original_response(embed=build_digest_embed(applications, page), view=DigestView(applications, page))
+        except discord.HTTPException as e:
+            logger.error(f"更新汇总消息失败: {e}")
+        
+        if errors:
+            await interaction.followup.send('部分申请处理失败：\n' + '\n'.join(errors), ephemeral=True)
+
+class DigestPageButton(discord.ui.DynamicItem[discord.ui.Button], template=r'digest:page:(?P<page>[0-9]+):(?P<direction>prev|next)'):
+    """汇总消息的翻页按钮"""
+    def __init__(self, page: int, direction: str, disabled: bool = False):
+        button = discord.ui.Button(
+            label='上一页' if direction == 'prev' else '下一页',
+            emoji='◀️' if direction == 'prev' else '▶️',
+            style=discord.ButtonStyle.secondary,
+            custom_id=f'digest:page:{page}:{direction}',
+            disabled=disabled
+        )
+        super().__init__(button)
+        self.page = page
+    
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(int(match['page']), match['direction'])
+    
+    @instrument('digest_page')
+    async def callback(self, interaction: discord.Interaction):
+        applications = interaction.client.config_manager.application_store.list_by_digest(interaction.message.id)
+        page = min(self.page, page_count(applications) - 1)
+        await interaction.response.edit_message(embed=build_digest_embed(applications, page), view=DigestView(applications, page))
+
+class DigestAggregator:
+    """汇总模式：把一段时间内的新申请合并为一条带分页的消息"""
+    
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self, bot):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(bot))
+    
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _loop(self, bot):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush(bot)
+            except Exception as e:
+                logger.error(f"发送汇总消息失败: {e}")
+    
+    async def flush(self, bot, guild_id: Optional[int] = None, force: bool = False):
+        """发送到期的汇总消息
+        
+        force 为 True 时忽略汇总间隔；指定 guild_id 时无论当前模式都会发送，
+        用于切换回卡片模式前清空尚未汇总的申请。
+        """
+        config_manager = bot.config_manager
+        store = config_manager.application_store
+        now = time.time()
+        
+        for undigested_guild_id, oldest, count in store.undigested_guilds():
+            if guild_id is not None and undigested_guild_id != guild_id:
+                continue
+            mode, window = config_manager.get_review_mode(undigested_guild_id)
+            if mode != 'digest' and guild_id is None:
+                continue
+            if not force and oldest > now - window and count < DIGEST_CAPACITY:
+                continue
+            
+            review_channel_id = config_manager.get_review_channel_id(undigested_guild_id)
+            review_channel = bot.get_channel(review_channel_id) if review_channel_id else None
+            if not review_channel:
+                continue
+            
+            while True:
+                applications = store.list_undigested(undigested_guild_id, DIGEST_CAPACITY)
+                if not applications:
+                    break
+                try:
+                    message = await bot.job_queue.submit(
+                        'send_message',
+                        lambda: review_channel.send(embed=build_digest_embed(applications, 0), view=DigestView(applications, 0)),
+                        priority=PRIORITY_MESSAGE,
+                        guild_id=undigested_guild_id
+                    )
+                except discord.HTTPException as e:
+                    logger.error(f"服务器 {undigested_guild_id} 发送汇总消息失败: {e}")
+                    break
+                store.set_digest([application['id'] for application in applications], review_channel.id, message.id)
+                logger.info(f"服务器 {undigested_guild_id} 已发送包含 {len(applications)} 个申请的汇总消息")
+                if len(applications) < DIGEST_CAPACITY:
+                    break
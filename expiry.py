@@ -0,0 +1,202 @@
+import asyncio
+import heapq
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+import discord
+from digest import build_digest_embed, DigestView
+from job_queue import PRIORITY_BACKGROUND
+from verification_views import claim_application, finish_claim
+from logger import get_logger
+
+logger = get_logger('expiry')
+
+# 过期申请正被审核者处理时，稍后再检查
+RETRY_DELAY = 30.0
+
+def build_expired_embed(application: dict, expire_after: float) -> discord.Embed:
+    """构建已过期的审核卡片"""
+    embed = discord.Embed(
+        title='⌛ 验证申请已过期',
+        description=f'申请者: <@{application["user_id"]}>',
+        color=discord.Color.dark_grey(),
+        timestamp=datetime.now()
+    )
+    if application['reason']:
+        embed.add_field(name='申请原因', value=application['reason'], inline=False)
+    embed.add_field(name='说明', value=f'超过 {expire_after / 3600:g} 小时未审核，已自动关闭', inline=False)
+    return embed
+
+class ExpiryScheduler:
+    """按服务器设置的有效期关闭长时间未审核的申请
+    
+    所有服务器共用一个最小堆，每个服务器只保存一个到期时间（最早的待审核申请提交时间 + 有效期），
+    由单个任务等待最近的到期时间；到期后分批关闭申请，再根据剩余申请重新安排。
+    堆中过时的条目在弹出时跳过。启动时和每隔 rescan_interval 秒从数据库重建，重启后不会遗漏。
+    """
+    
+    def __init__(self, application_store, rescan_interval: float = 300.0, batch_size: int = 25):
+        self.application_store = application_store
+        self.rescan_interval = rescan_interval
+        self.batch_size = batch_size
+        self._heap: List[tuple] = []
+        self._deadlines: Dict[int, float] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        
+        # 统计数据
+        self.expired = 0
+        self.batches = 0
+    
+    def start(self, bot):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(bot))
+            logger.info(f"申请过期检查已启动，重新扫描间隔 {self.rescan_interval} 秒，每批 {self.batch_size} 个")
+    
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def schedule(self, guild_id: int, deadline: float):
+        """安排服务器在 deadline 检查过期申请；已有更早的安排时忽略"""
+        current = self._deadlines.get(guild_id)
+        if current is not None and current <= deadline:
+            return
+        self._deadlines[guild_id] = deadline
+        heapq.heappush(self._heap, (deadline, guild_id))
+        self._wakeup.set()
+    
+    def reschedule(self, bot, guild_id: int):
+        """有效期修改后按数据库中的申请重新安排服务器"""
+        self._deadlines.pop(guild_id, None)
+        if bot.get_guild(guild_id) is None:
+            return
+        expire_after = bot.config_manager.get_expire_after(guild_id)
+        oldest = self.application_store.oldest_pending(guild_id)
+        if expire_after and oldest is not None:
+            self.schedule(guild_id, oldest + expire_after)
+        else:
+            self._wakeup.set()
+    
+    def rescan(self, bot):
+        """从数据库重建本进程负责的服务器的到期时间
+        
+        多进程分片时数据库是共享的，其他进程的服务器由各自的进程处理（本进程也无法更新它们的审核卡片）。
+        """
+        for guild_id, oldest in self.application_store.oldest_pending_by_guild():
+            if bot.get_guild(guild_id) is None:
+                continue
+            expire_after = bot.config_manager.get_expire_after(guild_id)
+            if expire_after:
+                self.schedule(guild_id, oldest + expire_after)
+    
+    async def _loop(self, bot):
+        # 就绪后才知道本进程负责哪些服务器
+        await bot.wait_until_ready()
+        next_rescan = 0.0
+        while True:
+            try:
+                if time.monotonic() >= next_rescan:
+                    self.rescan(bot)
+                    next_rescan = time.monotonic() + self.rescan_interval
+                
+                now = time.time()
+                while self._heap and self._heap[0][0] <= now:
+                    deadline, guild_id = heapq.heappop(self._heap)
+                    if self._deadlines.get(guild_id) != deadline:
+                        continue
+                    del self._deadlines[guild_id]
+                    await self.expire_guild(bot, guild_id)
+            except Exception as e:
+                logger.error(f"关闭过期申请失败: {e}")
+            
+            timeout = next_rescan - time.monotonic()
+            if self._heap:
+                timeout = min(timeout, self._heap[0][0] - time.time())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, timeout))
+            except asyncio.TimeoutError:
+                pass
+    
+    async def expire_guild(self, bot, guild_id: int) -> int:
+        """关闭服务器中所有已过期的申请，返回关闭的数量"""
+        store = self.application_store
+        expire_after = bot.config_manager.get_expire_after(guild_id)
+        if not expire_after or bot.get_guild(guild_id) is None:
+            return 0
+        
+        total = 0
+        try:
+            while True:
+                cutoff = time.time() - expire_after
+                applications = store.list_pending(guild_id, submitted_before=cutoff, limit=self.batch_size)
+                expired = []
+                for application in applications:
+                    # 与审核者同时操作时，已被认领的申请交给审核者处理
+                    if claim_application(store, application['id'], bot.user.id) is not None:
+                        continue
+                    store.set_status(application['id'], 'expired')
+                    finish_claim(store, application['id'], decided=True)
+                    expired.append(application)
+                
+                if expired:
+                    self.expired += len(expired)
+                    self.batches += 1
+                    total += len(expired)
+                    await self._close_cards(bot, guild_id, expired, expire_after)
+                if len(applications) < self.batch_size or not expired:
+                    break
+        finally:
+            oldest = store.oldest_pending(guild_id)
+            if oldest is not None:
+                self.schedule(guild_id, max(oldest + expire_after, time.time() + RETRY_DELAY))
+        
+        if total:
+            logger.info(f"服务器 {guild_id} 已关闭 {total} 个过期申请", extra={'guild_id': guild_id})
+        return total
+    
+    async def _close_cards(self, bot, guild_id: int, applications: List[dict], expire_after: float):
+        """移除过期申请审核卡片上的按钮，汇总消息每条只重新渲染一次"""
+        store = self.application_store
+        edits = []
+        digests = {}
+        for application in applications:
+            channel = bot.get_channel(application['channel_id']) if application['channel_id'] else None
+            if channel is None:
+                continue
+            if application['message_id']:
+                message = channel.get_partial_message(application['message_id'])
+                embed = build_expired_embed(application, expire_after)
+                edits.append(lambda message=message, embed=embed: message.edit(embed=embed, view=None))
+            elif application['digest_message_id']:
+                digests[application['digest_message_id']] = channel
+        
+        for message_id, channel in digests.items():
+            message = channel.get_partial_message(message_id)
+            entries = store.list_by_digest(message_id)
+            edits.append(lambda message=message, entries=entries: message.edit(
+                embed=build_digest_embed(entries, 0), view=DigestView(entries, 0)
+            ))
+        
+        results = await asyncio.gather(*[
+            bot.job_queue.submit('edit_message', edit, priority=PRIORITY_BACKGROUND, guild_id=guild_id)
+            for edit in edits
+        ], return_exceptions=True)
+        for result in results:
+            if isinstance(result, discord.HTTPException):
+                logger.warning(f"更新过期申请的审核卡片失败: {result}", extra={'guild_id': guild_id})
+            elif isinstance(result, BaseException):
+                raise result
+    
+    def stats(self) -> dict:
+        return {
+            'expired': self.expired,
+            'batches': self.batches,
+            'scheduled_guilds': len(self._deadlines),
+        }
@@ -0,0 +1,124 @@
+import asyncio
+import os
+from typing import Optional
+import discord
+from logger import setup_logger, get_logger
+
+logger = get_logger('reload')
+
+# 修改后可直接生效的配置节，其余配置需重启
+LIVE_SECTIONS = ('bot.activity_type', 'bot.activity_name', 'logging.', 'admission.', 'storage.flush_interval',
+                 'performance.member_cache_ttl', 'reload.interval')
+
+def build_activity(activity_type: str, activity_name: str) -> discord.BaseActivity:
+    """根据配置构建机器人活动状态"""
+    activity_type = activity_type.lower()
+    if activity_type == 'listening':
+        return discord.Activity(type=discord.ActivityType.listening, name=activity_name)
+    if activity_type == 'watching':
+        return discord.Activity(type=discord.ActivityType.watching, name=activity_name)
+    return discord.Game(name=activity_name)
+
+def _file_signature(path: str) -> Optional[tuple]:
+    """文件的修改时间和大小，文件不存在时返回 None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+class ConfigWatcher:
+    """定期检查 config.cfg 和服务器数据文件，变化时校验并替换内存中的配置"""
+    
+    def __init__(self, config_manager, interval: float = 2.0):
+        self.config_manager = config_manager
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._config_signature = _file_signature(config_manager.config_path)
+        data_manager = config_manager.data_manager
+        self._data_signature = _file_signature(data_manager.data_file) if data_manager.reloadable else None
+    
+    def start(self, bot):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(bot))
+            logger.info(f"已启用配置热重载，检查间隔 {self.interval} 秒")
+    
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _loop(self, bot):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check(bot)
+            except Exception as e:
+                logger.error(f"检查配置文件失败: {e}")
+    
+    async def check(self, bot):
+        """检查文件是否变化，有变化时重新加载"""
+        signature = _file_signature(self.config_manager.config_path)
+        if signature is not None and signature != self._config_signature:
+            self._config_signature = signature
+            await self.reload_config(bot)
+        
+        data_manager = self.config_manager.data_manager
+        if data_manager.reloadable:
+            signature = _file_signature(data_manager.data_file)
+            if signature is not None and signature != self._data_signature:
+                self._data_signature = signature
+                # 跳过本进程自己写入的文件
+                if signature[0] != data_manager.last_write_mtime:
+                    self.reload_data()
+    
+    async def reload_config(self, bot):
+        """重新加载 config.cfg 并应用可直接生效的配置"""
+        try:
+            changes = self.config_manager.reload_config()
+        except ValueError as e:
+            logger.error(f"config.cfg 重新加载失败，继续使用原配置: {e}")
+            return
+        if not changes:
+            return
+        
+        for key, old, new in changes:
+            live = key.startswith(LIVE_SECTIONS)
+            logger.info(f"配置变化: {key}: {old!r} -> {new!r}" + ('' if live else '（需重启生效）'))
+        changed = {key for key, _, _ in changes}
+        
+        if any(key.startswith('logging.') for key in changed):
+            setup_logger(**self.config_manager.get_logging_config())
+        
+        admission = self.config_manager.get_admission_config()
+        bot.admission.cooldown = admission['cooldown']
+        bot.admission.per_minute = admission['per_minute']
+        
+        self.config_manager.data_manager.flush_interval = self.config_manager.get_storage_config()[1]
+        bot.member_cache.ttl = self.config_manager.get_performance_config()[2]
+        self.interval = self.config_manager.get_reload_config()[1]
+        
+        if changed & {'bot.activity_type', 'bot.activity_name'} and bot.is_ready():
+            activity = build_activity(*self.config_manager.get_activity_config())
+            await bot.change_presence(activity=activity)
+            logger.info('活动状态已更新')
+    
+    def reload_data(self):
+        """重新加载服务器数据文件"""
+        data_manager = self.config_manager.data_manager
+        try:
+            diff = data_manager.reload_data()
+        except ValueError as e:
+            logger.error(f"{data_manager.data_file} 重新加载失败，继续使用原配置: {e}")
+            return
+        logger.info(
+            f"已重新加载 {data_manager.data_file}: 新增 {len(diff['added'])} 个、删除 {len(diff['removed'])} 个、"
+            f"修改 {len(diff['changed'])} 个服务器配置"
+        )
+        for action, guild_keys in (('新增', diff['added']), ('删除', diff['removed']), ('修改', diff['changed'])):
+            if guild_keys:
+                logger.info(f"  {action}: {', '.join(guild_keys[:20])}" + (' …' if len(guild_keys) > 20 else ''))
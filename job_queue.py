@@ -0,0 +1,211 @@
+import asyncio
+import itertools
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import discord
+from logger import get_logger
+
+logger = get_logger('queue')
+
+# 优先级：数值越小越先执行
+PRIORITY_ROLE = 0
+PRIORITY_MESSAGE = 1
+PRIORITY_DM = 2
+PRIORITY_BACKGROUND = 3
+
+class TokenBucket:
+    """令牌桶限速器"""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+    
+    def reserve(self) -> float:
+        """预订一个令牌，返回需要等待的秒数"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+class _Job:
+    __slots__ = ('route', 'guild_id', 'factory', 'future', 'enqueued_at', 'attempts', 'reserved')
+    
+    def __init__(self, route: str, guild_id: Optional[int], factory: Callable[[], Awaitable[Any]], future: asyncio.Future):
+        self.route = route
+        self.guild_id = guild_id
+        self.factory = factory
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.attempts = 0
+        # 已预订限速令牌，重新入队后直接执行
+        self.reserved = False
+
+class OutboundQueue:
+    """出站 API 请求队列：按路由限速、限制并发、失败重试，并按优先级执行"""
+    
+    # 路由默认限速：(每秒令牌数, 桶容量)。per_guild 为 True 的路由按服务器分别限速
+    DEFAULT_ROUTES = {
+        'add_roles': (5.0, 5, True),
+        'edit_member': (5.0, 5, True),
+        'edit_message': (5.0, 5, True),
+        'send_message': (5.0, 5, True),
+        'dm': (1.0, 5, False),
+    }
+    
+    def __init__(self, concurrency: int = 4, max_retries: int = 3, base_delay: float = 1.0,
+                 routes: Optional[Dict[str, tuple]] = None):
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.routes = dict(self.DEFAULT_ROUTES)
+        if routes:
+            self.routes.update(routes)
+        
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+        self._buckets: Dict[Tuple[str, Optional[int]], TokenBucket] = {}
+        self._workers: list = []
+        # 等待限速或重试的请求：序号 → (定时器, 请求)，到期后放回优先级队列，不占用工作任务
+        self._delayed: Dict[int, tuple] = {}
+        
+        # 统计数据
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+    
+    def start(self):
+        """启动工作任务（需在事件循环中调用）"""
+        if self._workers:
+            return
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        logger.info(f"出站请求队列已启动，并发数 {self.concurrency}")
+    
+    async def close(self):
+        """停止工作任务，取消尚未执行的请求"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for handle, job in self._delayed.values():
+            handle.cancel()
+            job.future.cancel()
+        self._delayed.clear()
+        while not self._queue.empty():
+            _, _, job = self._queue.get_nowait()
+            job.future.cancel()
+    
+    def submit(self, route: str, factory: Callable[[], Awaitable[Any]], priority: int = PRIORITY_MESSAGE,
+               guild_id: Optional[int] = None) -> asyncio.Future:
+        """提交请求。factory 每次调用返回一个新的协程，以便失败后重试"""
+        future = asyncio.get_running_loop().create_future()
+        job = _Job(route, guild_id, factory, future)
+        self._queue.put_nowait((priority, next(self._sequence), job))
+        return future
+    
+    def _requeue(self, delay: float, priority: int, job: _Job):
+        """delay 秒后把请求放回优先级队列"""
+        sequence = next(self._sequence)
+        
+        def ready():
+            self._delayed.pop(sequence, None)
+            self._queue.put_nowait((priority, sequence, job))
+        
+        handle = asyncio.get_running_loop().call_later(delay, ready)
+        self._delayed[sequence] = (handle, job)
+    
+    def _bucket_for(self, job: _Job) -> Optional[TokenBucket]:
+        limit = self.routes.get(job.route)
+        if not limit:
+            return None
+        rate, capacity, per_guild = limit
+        key = (job.route, job.guild_id if per_guild else None)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rate, capacity)
+        return bucket
+    
+    def _retry_delay(self, error: Exception, attempts: int) -> Optional[float]:
+        """返回重试前的等待秒数，不可重试时返回 None"""
+        if attempts > self.max_retries:
+            return None
+        if isinstance(error, discord.RateLimited):
+            return error.retry_after
+        if isinstance(error, discord.HTTPException) and (error.status == 429 or error.status >= 500):
+            return self.base_delay * (2 ** (attempts - 1))
+        if isinstance(error, (asyncio.TimeoutError, OSError)):
+            return self.base_delay * (2 ** (attempts - 1))
+        return None
+    
+    async def _worker(self):
+        while True:
+            priority, _, job = await self._queue.get()
+            try:
+                if job.future.cancelled():
+                    continue
+                
+                # 需要等待限速时预订令牌后放回队列，工作任务继续处理其他（可能更高优先级的）请求
+                bucket = self._bucket_for(job)
+                if bucket and not job.reserved:
+                    delay = bucket.reserve()
+                    if delay > 0:
+                        job.reserved = True
+                        self._requeue(delay, priority, job)
+                        continue
+                job.reserved = False
+                
+                if job.attempts == 0:
+                    waited = time.monotonic() - job.enqueued_at
+                    self.wait_count += 1
+                    self.wait_total += waited
+                    self.wait_max = max(self.wait_max, waited)
+                
+                job.attempts += 1
+                self.in_flight += 1
+                try:
+                    result = await job.factory()
+                except Exception as e:
+                    delay = self._retry_delay(e, job.attempts)
+                    if delay is None:
+                        self.failed += 1
+                        if not job.future.done():
+                            job.future.set_exception(e)
+                    else:
+                        self.retried += 1
+                        logger.warning(f"请求 {job.route} 失败，{delay:.1f} 秒后第 {job.attempts} 次重试: {e}")
+                        self._requeue(delay, priority, job)
+                else:
+                    self.completed += 1
+                    if not job.future.done():
+                        job.future.set_result(result)
+                finally:
+                    self.in_flight -= 1
+            finally:
+                self._queue.task_done()
+    
+    @property
+    def depth(self) -> int:
+        """排队中的请求数（含等待限速或重试的请求）"""
+        return self._queue.qsize() + len(self._delayed)
+    
+    def stats(self) -> Dict[str, Any]:
+        """队列统计数据"""
+        return {
+            'depth': self.depth,
+            'delayed': len(self._delayed),
+            'in_flight': self.in_flight,
+            'completed': self.completed,
+            'failed': self.failed,
+            'retried': self.retried,
+            'wait_avg_ms': round(self.wait_total / self.wait_count * 1000, 2) if self.wait_count else 0.0,
+            'wait_max_ms': round(self.wait_max * 1000, 2),
+        }
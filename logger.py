@@ -1,9 +1,79 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import multiprocessing
 import os
+import queue
+import random
 from datetime import datetime
 
-def setup_logger():
-    """设置日志系统"""
+# 结构化日志中额外输出的字段
+EXTRA_FIELDS = ('guild_id', 'user_id', 'latency_ms')
+
+_listener = None
+
+class JsonLinesFormatter(logging.Formatter):
+    """JSON Lines 格式，每条日志一行"""
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """写入队列前只合并消息参数，异常堆栈保留在 exc_text 中
+    
+    默认的 prepare 会把堆栈拼进 message 并清除 exc_text，后台线程中的 JSON 格式化器就无法输出单独的 exception 字段。
+    """
+    def prepare(self, record):
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+class SamplingFilter(logging.Filter):
+    """对标记为 sample 的高频 INFO 日志按比例采样"""
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+    
+    def filter(self, record):
+        if self.rate >= 1.0 or record.levelno != logging.INFO or not getattr(record, 'sample', False):
+            return True
+        return random.random() < self.rate
+
+def _log_file(name: str) -> str:
+    """日志文件路径；多进程分片时每个工作进程使用自己的文件，避免轮转时互相覆盖"""
+    process_name = multiprocessing.current_process().name
+    if process_name == 'MainProcess':
+        return f'logs/{name}.log'
+    return f'logs/{name}-{process_name}.log'
+
+def setup_logger(json_format: bool = False, retention_days: int = 14, info_sample_rate: float = 1.0):
+    """设置日志系统
+    
+    日志先写入内存队列，由后台线程写入控制台和文件，避免在事件循环中进行磁盘 I/O。
+    文件每天午夜轮转，保留 retention_days 天。重复调用时会按新参数重新配置。
+    """
+    global _listener
+    
     # 创建logs目录
     if not os.path.exists('logs'):
         os.makedirs('logs')
@@ -13,44 +83,73 @@ def setup_logger():
         '%(asctime)s | %(levelname)s | %(name)s | %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
+    file_formatter = JsonLinesFormatter() if json_format else formatter
     
     # 创建主日志记录器
     logger = logging.getLogger('verification_bot')
     logger.setLevel(logging.INFO)
     
-    # 避免重复添加处理器
-    if logger.handlers:
-        return logger
+    # 重新配置时先停止旧的后台线程并移除处理器，避免重复输出
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
     
     # 控制台输出
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
     
-    # 文件输出 - 按日期命名
-    today = datetime.now().strftime('%Y-%m-%d')
-    file_handler = logging.FileHandler(
-        f'logs/bot_{today}.log', 
+    # 文件输出 - 每天午夜轮转
+    file_handler = logging.handlers.TimedRotatingFileHandler(
+        _log_file('bot'),
+        when='midnight',
+        backupCount=retention_days,
         encoding='utf-8'
     )
     file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    file_handler.setFormatter(file_formatter)
     
     # 错误日志单独记录
-    error_handler = logging.FileHandler(
-        f'logs/errors_{today}.log', 
+    error_handler = logging.handlers.TimedRotatingFileHandler(
+        _log_file('errors'),
+        when='midnight',
+        backupCount=retention_days,
         encoding='utf-8'
     )
     error_handler.setLevel(logging.ERROR)
-    error_handler.setFormatter(formatter)
-    logger.addHandler(error_handler)
+    error_handler.setFormatter(file_formatter)
+    
+    # 通过队列交给后台线程写入
+    log_queue = queue.SimpleQueue()
+    queue_handler = StructuredQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(info_sample_rate))
+    logger.addHandler(queue_handler)
+    
+    _listener = logging.handlers.QueueListener(
+        log_queue, console_handler, file_handler, error_handler, respect_handler_level=True
+    )
+    _listener.start()
     
     return logger
 
+def shutdown_logger():
+    """停止后台线程并写出队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+atexit.register(shutdown_logger)
+
 def get_logger(name=None):
     """获取日志记录器"""
     if name:
         return logging.getLogger(f'verification_bot.{name}')
-    return logging.getLogger('verification_bot')
\ No newline at end of file
+    return logging.getLogger('verification_bot')
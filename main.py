@@ -1,15 +1,45 @@
 import discord
 from discord.ext import commands
 import asyncio
+import sys
+import time
+from typing import List, Optional
 from config_manager import ConfigManager
-from verification_views import VerificationView
+from data_manager import DataCorruptionError
+from job_queue import OutboundQueue
+from member_cache import MemberCache
+from admission import AdmissionController
+from digest import DigestAggregator, DigestSelect, DigestPageButton
+from reconcile import RoleReconciler
+from expiry import ExpiryScheduler
+from command_sync import CommandSyncer
+from hot_reload import ConfigWatcher, build_activity
+from metrics import MetricsServer, get_memory_usage_mb
+from startup import StartupProfile
+from verification_views import VerificationView, ReviewButton
 from logger import setup_logger, get_logger
 
+# 记录启动时间和各阶段耗时
+START_TIME = time.perf_counter()
+startup = StartupProfile(START_TIME)
+
 # 初始化日志系统
 logger = setup_logger()
 
-# 初始化配置管理器
-config_manager = ConfigManager()
+# 初始化配置管理器；数据文件损坏时拒绝启动，避免以空配置覆盖原有数据
+try:
+    with startup.phase('配置加载'):
+        config_manager = ConfigManager()
+except DataCorruptionError as e:
+    logger.critical(f'数据文件损坏，拒绝启动: {e}')
+    logger.critical('请从备份恢复数据文件，或确认无误后手动删除该文件再启动')
+    sys.exit(1)
+# 服务器数据单独计时，从配置加载中扣除
+startup.record('配置加载', startup.phases['配置加载'] - config_manager.data_manager.load_seconds)
+startup.record('加载服务器数据', config_manager.data_manager.load_seconds)
+
+# 按配置文件重新配置日志
+setup_logger(**config_manager.get_logging_config())
 
 # 设置机器人意图
 intents = discord.Intents.default()
@@ -17,9 +47,61 @@ intents.guilds = True
 intents.guild_messages = True
 intents.members = True  # 需要成员意图来获取成员信息
 
-# 创建机器人实例
-bot = commands.Bot(command_prefix='/', description=config_manager.get_bot_description(), intents=intents)
-bot.config_manager = config_manager
+def create_bot(shard_ids: Optional[List[int]] = None, shard_count: Optional[int] = None) -> commands.Bot:
+    """创建机器人实例；启用分片或指定分片范围时使用 AutoShardedBot"""
+    sharded, configured_count = config_manager.get_shard_config()
+    shard_count = shard_count or configured_count
+    low_memory, cache_size, cache_ttl = config_manager.get_performance_config()
+    
+    # 活动状态随 IDENTIFY 发送，重连后自动沿用，无需在 on_ready 中重新设置
+    options = {'activity': build_activity(*config_manager.get_activity_config())}
+    if low_memory:
+        # 不在启动时拉取成员列表，也不缓存成员，需要时使用 MemberCache
+        options['chunk_guilds_at_startup'] = False
+        options['member_cache_flags'] = discord.MemberCacheFlags.none()
+        logger.info('已启用低内存模式')
+    
+    if sharded or shard_ids is not None:
+        new_bot = commands.AutoShardedBot(
+            command_prefix='/',
+            description=config_manager.get_bot_description(),
+            intents=intents,
+            shard_ids=shard_ids,
+            shard_count=shard_count,
+            **options
+        )
+        logger.info(f'分片模式: 分片总数 {shard_count or "自动"}，本进程分片 {shard_ids if shard_ids is not None else "全部"}')
+    else:
+        new_bot = commands.Bot(command_prefix='/', description=config_manager.get_bot_description(), intents=intents, **options)
+    
+    new_bot.low_memory = low_memory
+    new_bot.ready_count = 0
+    new_bot.sync_task = None
+    new_bot.connect_started = START_TIME
+    new_bot.member_cache = MemberCache(cache_size, cache_ttl)
+    new_bot.config_manager = config_manager
+    metrics_enabled, metrics_host, metrics_port = config_manager.get_metrics_config()
+    new_bot.metrics_server = MetricsServer(new_bot, metrics_host, metrics_port) if metrics_enabled else None
+    sync_mode, dev_guild_id = config_manager.get_command_sync_config()
+    new_bot.command_syncer = CommandSyncer(mode=sync_mode, dev_guild_id=dev_guild_id)
+    new_bot.job_queue = OutboundQueue(**config_manager.get_queue_config())
+    new_bot.admission = AdmissionController(config_manager.application_store, **config_manager.get_admission_config())
+    new_bot.digest = DigestAggregator()
+    reconcile_enabled, reconcile_options = config_manager.get_reconcile_config()
+    new_bot.reconciler = RoleReconciler(config_manager.application_store, **reconcile_options) if reconcile_enabled else None
+    expiry_enabled, expiry_options = config_manager.get_expiry_config()
+    new_bot.expiry = ExpiryScheduler(config_manager.application_store, **expiry_options) if expiry_enabled else None
+    reload_enabled, reload_interval = config_manager.get_reload_config()
+    new_bot.config_watcher = ConfigWatcher(config_manager, reload_interval) if reload_enabled else None
+    # 多进程时只由负责 0 号分片的进程同步斜杠命令
+    new_bot.sync_commands = shard_ids is None or 0 in shard_ids
+    new_bot.event(on_ready)
+    new_bot.event(on_shard_ready)
+    new_bot.setup_hook = setup_hook
+    return new_bot
+
+# 创建机器人实例（由 main 根据分片参数创建）
+bot: Optional[commands.Bot] = None
 
 async def load_extensions():
     """加载扩展"""
@@ -29,61 +111,110 @@ async def load_extensions():
     except Exception as e:
         logger.error(f'加载命令模块失败: {e}')
 
-@bot.event
+async def sync_commands():
+    """同步斜杠命令，与网关连接并行进行"""
+    try:
+        with startup.phase('同步命令'):
+            synced = await bot.command_syncer.sync(bot)
+        for command in synced or []:
+            logger.info(f'  - /{command.name}')
+    except Exception as e:
+        logger.error(f'同步斜杠命令失败: {e}')
+
+async def on_shard_ready(shard_id: int):
+    logger.info(f'分片 {shard_id} 已就绪')
+
 async def on_ready():
-    logger.info(f'机器人 {bot.user} 已连接到Discord!')
+    """每次（重新）建立网关会话都会触发，只做轻量的工作；一次性初始化在 setup_hook 中完成"""
+    bot.ready_count += 1
+    if bot.ready_count > 1:
+        logger.info(f'机器人 {bot.user} 已重新连接（第 {bot.ready_count - 1} 次）')
+        return
     
-    try:
-        # 设置机器人活动状态
-        activity_type, activity_name = config_manager.get_activity_config()
-        if activity_type.lower() == 'playing':
-            activity = discord.Game(name=activity_name)
-        elif activity_type.lower() == 'listening':
-            activity = discord.Activity(type=discord.ActivityType.listening, name=activity_name)
-        elif activity_type.lower() == 'watching':
-            activity = discord.Activity(type=discord.ActivityType.watching, name=activity_name)
-        else:
-            activity = discord.Game(name=activity_name)
+    startup.record('首次就绪', time.perf_counter() - bot.connect_started)
+    logger.info(f'机器人 {bot.user} 已连接到Discord!')
+    mode = '低内存模式' if bot.low_memory else '标准模式'
+    member_count = sum(len(guild.members) for guild in bot.guilds)
+    logger.info(
+        f'启动报告 ({mode}): 耗时 {startup.elapsed():.2f} 秒，'
+        f'内存 {get_memory_usage_mb():.1f} MB，{len(bot.guilds)} 个服务器，已缓存 {member_count} 个成员'
+    )
+    logger.info(f'启动阶段: {startup.report()}')
+
+async def setup_hook():
+    """一次性初始化，在连接网关之前执行"""
+    with startup.phase('初始化'):
+        # 启动数据后台写入任务
+        config_manager.data_manager.start()
         
-        await bot.change_presence(activity=activity)
-        logger.info('活动状态已设置')
+        # 启动出站请求队列、排队申请和汇总消息的发送任务
+        bot.job_queue.start()
+        bot.admission.start(bot)
+        bot.digest.start(bot)
         
-        # 添加持久化视图
-        logger.info('正在加载验证视图...')
-        try:
-            view = VerificationView(config_manager, bot)
-            bot.add_view(view)
-            logger.info('验证视图已加载')
-        except Exception as e:
-            logger.error(f'验证视图加载失败: {e}')
-            logger.warning('继续运行但无持久化视图')
+        # 后台核对身份组
+        if bot.reconciler:
+            bot.reconciler.start(bot)
         
-    except Exception as e:
-        logger.error(f'on_ready 执行出错: {e}')
+        # 关闭超过有效期的申请
+        if bot.expiry:
+            bot.expiry.start(bot)
+        
+        # 监视配置文件，修改后无需重启
+        if bot.config_watcher:
+            bot.config_watcher.start(bot)
+        
+        # 注册验证面板的持久化视图，以及审核按钮和汇总消息的动态处理器（所有审核卡片共用）
+        bot.add_view(VerificationView(config_manager, bot))
+        bot.add_dynamic_items(ReviewButton, DigestSelect, DigestPageButton)
     
-    logger.info('机器人已就绪！')
-
-async def setup_hook():
-    """机器人启动前的设置"""
-    await load_extensions()
+    # 指标端点和扩展加载互不依赖，并发执行
+    async def start_metrics():
+        if bot.metrics_server:
+            try:
+                await bot.metrics_server.start()
+            except OSError as e:
+                logger.error(f'指标端点启动失败: {e}')
     
-    # 在这里同步命令，避免在 on_ready 中阻塞
-    try:
-        synced = await bot.tree.sync()
-        logger.info(f'已同步 {len(synced)} 个斜杠命令')
-        for command in synced:
-            logger.info(f'  - /{command.name}')
-    except Exception as e:
-        logger.error(f'同步斜杠命令失败: {e}')
+    async def load():
+        with startup.phase('加载扩展'):
+            await load_extensions()
+    
+    await asyncio.gather(start_metrics(), load())
     
+    # 命令同步只是一次 HTTP 请求，不必等它完成再连接网关
+    if bot.sync_commands:
+        startup.begin('同步命令')
+        bot.sync_task = asyncio.create_task(sync_commands())
+    
+    bot.connect_started = time.perf_counter()
     logger.info('机器人设置完成')
 
-async def main():
+async def main(shard_ids: Optional[List[int]] = None, shard_count: Optional[int] = None):
     """主函数"""
+    global bot
+    bot = create_bot(shard_ids, shard_count)
+    
     async with bot:
-        # 设置启动钩子
-        bot.setup_hook = setup_hook
-        await bot.start(config_manager.get_bot_token())
+        try:
+            await bot.start(config_manager.get_bot_token())
+        finally:
+            if bot.sync_task and not bot.sync_task.done():
+                bot.sync_task.cancel()
+            if bot.config_watcher:
+                await bot.config_watcher.close()
+            if bot.reconciler:
+                await bot.reconciler.close()
+            if bot.expiry:
+                await bot.expiry.close()
+            if bot.metrics_server:
+                await bot.metrics_server.close()
+            await bot.admission.close()
+            await bot.digest.close()
+            await bot.job_queue.close()
+            # 关闭前写入尚未保存的数据
+            await config_manager.data_manager.close()
+            config_manager.application_store.close()
 
 if __name__ == '__main__':
     asyncio.run(main())
\ No newline at end of file
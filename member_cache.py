@@ -0,0 +1,60 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+import discord
+from job_queue import PRIORITY_ROLE
+
+class MemberCache:
+    """最近交互成员和 fetch_member 结果的 LRU 缓存，条目超过有效期后失效"""
+    
+    def __init__(self, max_size: int = 1000, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[Tuple[int, int], Tuple[float, discord.Member]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def remember(self, member):
+        """记录成员（来自交互或 API 查询）"""
+        # 只缓存服务器成员（私信中的用户没有 guild）
+        if getattr(member, 'guild', None) is None:
+            return
+        key = (member.guild.id, member.id)
+        self._entries[key] = (time.monotonic() + self.ttl, member)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def get(self, guild_id: int, user_id: int) -> Optional[discord.Member]:
+        """从缓存中获取成员，过期返回 None"""
+        key = (guild_id, user_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, member = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return member
+    
+    def forget(self, guild_id: int, user_id: int):
+        self._entries.pop((guild_id, user_id), None)
+    
+    async def resolve(self, guild: discord.Guild, user_id: int, job_queue=None) -> discord.Member:
+        """依次从 discord.py 缓存、本地缓存和 API 获取成员；成员不存在时抛出 discord.NotFound"""
+        member = guild.get_member(user_id) or self.get(guild.id, user_id)
+        if member:
+            self.hits += 1
+            return member
+        
+        self.misses += 1
+        if job_queue is not None:
+            member = await job_queue.submit('fetch_member', lambda: guild.fetch_member(user_id), priority=PRIORITY_ROLE, guild_id=guild.id)
+        else:
+            member = await guild.fetch_member(user_id)
+        self.remember(member)
+        return member
+    
+    def __len__(self) -> int:
+        return len(self._entries)
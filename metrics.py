@@ -0,0 +1,260 @@
+import asyncio
+import functools
+import os
+import resource
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+import discord
+from logger import get_logger
+
+logger = get_logger('metrics')
+
+# 延迟直方图的桶上限（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def get_memory_usage_mb() -> float:
+    """获取当前进程的常驻内存（MB）"""
+    try:
+        with open('/proc/self/status', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # 非 Linux 系统退回到峰值内存
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if os.uname().sysname == 'Darwin' else peak / 1024
+
+class Histogram:
+    """固定桶的延迟直方图"""
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+    
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+    
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+    
+    def quantile(self, q: float) -> float:
+        """按桶估算分位数（返回所在桶的上限）"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for index, count in enumerate(self.counts):
+            running += count
+            if running >= target:
+                return self.buckets[index] if index < len(self.buckets) else float('inf')
+        return float('inf')
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels) -> str:
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+class MetricsRegistry:
+    """记录每个命令和按钮的调用次数、错误次数与延迟"""
+    
+    def __init__(self):
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.latency: Dict[str, Histogram] = defaultdict(Histogram)
+        self.guild_calls: Dict[Tuple[str, int], int] = defaultdict(int)
+        self.guild_errors: Dict[Tuple[str, int], int] = defaultdict(int)
+        self.guild_latency: Dict[int, Histogram] = defaultdict(Histogram)
+        self.loop_lag = Histogram()
+        self.loop_lag_last = 0.0
+    
+    def observe(self, handler: str, guild_id: Optional[int], seconds: float, error: bool = False):
+        """记录一次处理"""
+        self.calls[handler] += 1
+        self.latency[handler].observe(seconds)
+        if error:
+            self.errors[handler] += 1
+        if guild_id is not None:
+            self.guild_calls[(handler, guild_id)] += 1
+            self.guild_latency[guild_id].observe(seconds)
+            if error:
+                self.guild_errors[(handler, guild_id)] += 1
+    
+    def render(self, bot=None) -> str:
+        """输出 Prometheus 文本格式"""
+        lines = []
+        
+        def counter(name: str, help_text: str, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for labels, value in samples:
+                lines.append(f'{name}{labels} {value}')
+        
+        def gauge(name: str, help_text: str, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            for labels, value in samples:
+                lines.append(f'{name}{labels} {value}')
+        
+        def histogram(name: str, help_text: str, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for labels, hist in samples:
+                running = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    running += count
+                    lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {running}')
+                lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {hist.count}')
+                lines.append(f'{name}_sum{_labels(**labels)} {hist.total}')
+                lines.append(f'{name}_count{_labels(**labels)} {hist.count}')
+        
+        counter('verification_handler_calls_total', '处理器调用次数',
+                [(_labels(handler=h), v) for h, v in self.calls.items()])
+        counter('verification_handler_errors_total', '处理器异常次数',
+                [(_labels(handler=h), v) for h, v in self.errors.items()])
+        histogram('verification_handler_latency_seconds', '处理器耗时',
+                  [({'handler': h}, hist) for h, hist in self.latency.items()])
+        counter('verification_guild_handler_calls_total', '按服务器统计的处理器调用次数',
+                [(_labels(handler=h, guild_id=g), v) for (h, g), v in self.guild_calls.items()])
+        counter('verification_guild_handler_errors_total', '按服务器统计的处理器异常次数',
+                [(_labels(handler=h, guild_id=g), v) for (h, g), v in self.guild_errors.items()])
+        histogram('verification_guild_latency_seconds', '按服务器统计的处理器耗时',
+                  [({'guild_id': g}, hist) for g, hist in self.guild_latency.items()])
+        histogram('verification_event_loop_lag_seconds', '事件循环延迟', [({}, self.loop_lag)])
+        gauge('verification_event_loop_lag_last_seconds', '最近一次事件循环延迟', [('', self.loop_lag_last)])
+        gauge('verification_resident_memory_bytes', '进程常驻内存', [('', int(get_memory_usage_mb() * 1024 * 1024))])
+        
+        if bot is not None:
+            latencies = getattr(bot, 'latencies', None) or [(bot.shard_id or 0, bot.latency)]
+            gauge('verification_gateway_latency_seconds', '网关心跳延迟',
+                  [(_labels(shard=shard_id), latency) for shard_id, latency in latencies if latency == latency])
+            gauge('verification_guilds', '服务器数量', [('', len(bot.guilds))])
+            
+            job_queue = getattr(bot, 'job_queue', None)
+            if job_queue is not None:
+                stats = job_queue.stats()
+                gauge('verification_queue_depth', '出站请求排队数', [('', stats['depth'])])
+                gauge('verification_queue_in_flight', '出站请求执行中数量', [('', stats['in_flight'])])
+                counter('verification_queue_jobs_total', '出站请求结果',
+                        [(_labels(result=key), stats[key]) for key in ('completed', 'failed', 'retried')])
+                gauge('verification_queue_wait_avg_seconds', '出站请求平均等待时间', [('', stats['wait_avg_ms'] / 1000)])
+                gauge('verification_queue_wait_max_seconds', '出站请求最长等待时间', [('', stats['wait_max_ms'] / 1000)])
+            
+            member_cache = getattr(bot, 'member_cache', None)
+            if member_cache is not None:
+                gauge('verification_member_cache_size', '成员缓存条目数', [('', len(member_cache))])
+                counter('verification_member_cache_lookups_total', '成员缓存查询次数',
+                        [(_labels(result='hit'), member_cache.hits), (_labels(result='miss'), member_cache.misses)])
+        
+            reconciler = getattr(bot, 'reconciler', None)
+            if reconciler is not None:
+                stats = reconciler.stats()
+                gauge('verification_reconcile_drift', '最近一次完整核对发现的偏差',
+                      [(_labels(kind=kind), stats[kind]) for kind in ('missing_role', 'left', 'unexpected_role')])
+                gauge('verification_reconcile_guild_drift', '按服务器统计的核对偏差',
+                      [(_labels(guild_id=g, kind=kind), value) for g, counts in reconciler.drift.items() for kind, value in counts.items()])
+                counter('verification_reconcile_total', '核对处理数量',
+                        [(_labels(result=key), stats[key]) for key in ('checked', 'repaired', 'api_calls', 'passes')])
+        
+            expiry = getattr(bot, 'expiry', None)
+            if expiry is not None:
+                stats = expiry.stats()
+                counter('verification_expired_total', '因超过有效期关闭的申请数', [('', stats['expired'])])
+                gauge('verification_expiry_scheduled_guilds', '已安排过期检查的服务器数', [('', stats['scheduled_guilds'])])
+        
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+def _find_interaction(args) -> Optional[discord.Interaction]:
+    for arg in args:
+        if isinstance(arg, discord.Interaction):
+            return arg
+    return None
+
+def instrument(handler: str):
+    """装饰斜杠命令和视图回调，记录调用次数、异常和耗时"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            interaction = _find_interaction(args)
+            guild_id = interaction.guild_id if interaction is not None else None
+            start = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except BaseException:
+                registry.observe(handler, guild_id, time.perf_counter() - start, error=True)
+                raise
+            registry.observe(handler, guild_id, time.perf_counter() - start)
+            return result
+        return wrapper
+    return decorator
+
+class MetricsServer:
+    """本地 Prometheus 指标 HTTP 端点，并监测事件循环延迟"""
+    
+    def __init__(self, bot, host: str = '127.0.0.1', port: int = 9100, lag_interval: float = 0.5):
+        self.bot = bot
+        self.host = host
+        self.port = port
+        self.lag_interval = lag_interval
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._lag_task: Optional[asyncio.Task] = None
+    
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self._lag_task = asyncio.create_task(self._monitor_loop_lag())
+        logger.info(f'指标端点已启动: http://{self.host}:{self.port}/metrics')
+    
+    async def close(self):
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+    
+    async def _monitor_loop_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.lag_interval)
+            lag = max(0.0, loop.time() - start - self.lag_interval)
+            registry.loop_lag.observe(lag)
+            registry.loop_lag_last = lag
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # 读取并丢弃请求头
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=5)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+            
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                body = registry.render(self.bot).encode('utf-8')
+                status = '200 OK'
+                content_type = 'text/plain; version=0.0.4; charset=utf-8'
+            else:
+                body = b'not found\n'
+                status = '404 Not Found'
+                content_type = 'text/plain; charset=utf-8'
+            
+            header = (
+                f'HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n'
+                f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'
+            )
+            writer.write(header.encode('latin-1') + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
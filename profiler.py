@@ -0,0 +1,135 @@
+import asyncio
+import cProfile
+import gc
+import os
+import pstats
+import time
+import tracemalloc
+from collections import Counter
+from typing import List, Tuple
+import discord
+from logger import get_logger
+
+logger = get_logger('profiler')
+
+PROFILE_DIR = 'profiles'
+MAX_SECONDS = 120
+
+# 同一时间只允许一个采样，cProfile 和 tracemalloc 都是进程级的
+_lock = asyncio.Lock()
+
+def is_busy() -> bool:
+    return _lock.locked()
+
+def _report_path(kind: str, suffix: str) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    return os.path.join(PROFILE_DIR, f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}.{suffix}")
+
+def _short_path(filename: str) -> str:
+    """缩短文件路径，只保留 site-packages、标准库目录或当前目录之后的部分"""
+    for marker in ('site-packages' + os.sep, os.path.dirname(os.__file__) + os.sep, os.getcwd() + os.sep):
+        index = filename.rfind(marker)
+        if index >= 0:
+            return filename[index + len(marker):]
+    return filename
+
+async def profile_cpu(seconds: float, top: int = 10) -> Tuple[str, List[str]]:
+    """在事件循环线程上运行 cProfile seconds 秒，期间执行的所有回调和协程都会被记录
+    
+    返回 (报告文件路径, 按自身耗时排序的前 top 个函数)；同时保存 .prof 文件，可用 snakeviz 等工具查看。
+    """
+    async with _lock:
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profile.disable()
+        elapsed = time.perf_counter() - started
+        
+        path = _report_path('cpu', 'txt')
+        profile.dump_stats(path[:-3] + 'prof')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f'CPU profile: {elapsed:.1f}s\n\n')
+            stats = pstats.Stats(profile, stream=f)
+            stats.sort_stats('tottime').print_stats(50)
+            stats.sort_stats('cumulative').print_stats(50)
+        
+        # 事件循环等待 IO 的时间单独统计，不计入热点
+        idle = 0.0
+        rows = []
+        for (filename, lineno, name), (_, calls, tottime, _, _) in pstats.Stats(profile).stats.items():
+            if filename == '~' and "of 'select." in name:
+                idle += tottime
+            else:
+                rows.append((tottime, calls, f'{_short_path(filename)}:{lineno}({name})'))
+        rows.sort(reverse=True)
+        lines = [f'采样 {elapsed:.1f} 秒，其中空闲 {idle:.1f} 秒']
+        lines.extend(f'{tottime * 1000:8.1f}ms {calls:>7} {where}' for tottime, calls, where in rows[:top])
+        logger.info(f"CPU 采样完成（{elapsed:.1f} 秒），报告已保存到 {path}")
+        return path, lines
+
+async def profile_memory(seconds: float, top: int = 10) -> Tuple[str, List[str]]:
+    """用 tracemalloc 比较 seconds 秒前后的内存分配，返回 (报告文件路径, 增长最多的前 top 个位置)
+    
+    采样结束后停止跟踪（除非启动前已在跟踪），空闲时没有额外开销。
+    """
+    async with _lock:
+        started_here = not tracemalloc.is_tracing()
+        if started_here:
+            tracemalloc.start()
+        try:
+            ignore = (tracemalloc.Filter(False, tracemalloc.__file__),)
+            baseline = tracemalloc.take_snapshot().filter_traces(ignore)
+            await asyncio.sleep(seconds)
+            snapshot = tracemalloc.take_snapshot().filter_traces(ignore)
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if started_here:
+                tracemalloc.stop()
+        
+        diff = snapshot.compare_to(baseline, 'lineno')
+        path = _report_path('memory', 'txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f'Memory profile: {seconds:.1f}s, traced {current / 1048576:.1f} MiB, peak {peak / 1048576:.1f} MiB\n\n')
+            f.write('Top growth:\n')
+            for stat in diff[:50]:
+                f.write(f'{stat}\n')
+            f.write('\nTop allocated:\n')
+            for stat in snapshot.statistics('lineno')[:50]:
+                f.write(f'{stat}\n')
+        
+        lines = [f'已跟踪 {current / 1048576:.1f} MiB，峰值 {peak / 1048576:.1f} MiB']
+        for stat in diff[:top]:
+            frame = stat.traceback[0]
+            lines.append(
+                f'{stat.size_diff / 1024:+9.1f} KiB {stat.count_diff:+7} {_short_path(frame.filename)}:{frame.lineno}'
+            )
+        logger.info(f"内存采样完成（{seconds:.1f} 秒），报告已保存到 {path}")
+        return path, lines
+
+def count_live_objects() -> Counter:
+    """统计存活的视图、模态框和动态组件对象（按类名），只在调用时遍历一次 gc"""
+    kinds = (discord.ui.View, discord.ui.Modal, discord.ui.DynamicItem)
+    return Counter(type(obj).__name__ for obj in gc.get_objects() if isinstance(obj, kinds))
+
+def count_tasks() -> Counter:
+    """统计事件循环中的任务（按协程名）"""
+    counts = Counter()
+    for task in asyncio.all_tasks():
+        coro = task.get_coro()
+        counts[getattr(coro, '__qualname__', type(coro).__name__)] += 1
+    return counts
+
+def write_objects_report(objects: Counter, tasks: Counter) -> str:
+    """保存对象和任务统计，返回文件路径"""
+    path = _report_path('objects', 'txt')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('Live UI objects:\n')
+        for name, count in objects.most_common():
+            f.write(f'{count:>8} {name}\n')
+        f.write('\nTasks:\n')
+        for name, count in tasks.most_common():
+            f.write(f'{count:>8} {name}\n')
+    return path
@@ -0,0 +1,181 @@
+import asyncio
+import json
+from typing import Dict, Optional, Tuple
+import discord
+from job_queue import PRIORITY_BACKGROUND
+from logger import get_logger
+
+logger = get_logger('reconcile')
+
+DRIFT_KINDS = ('missing_role', 'left', 'unexpected_role')
+
+class RoleReconciler:
+    """后台核对已通过的申请与验证身份组的实际持有者
+    
+    每个服务器按申请记录ID分块扫描，游标和已累计的偏差一起保存在数据库中，重启后从上次的位置继续，
+    每轮报告的偏差总是覆盖服务器的全部记录。
+    每轮最多调用 api_budget 次 API；默认只统计偏差，开启 repair 后才补发身份组。
+    """
+    
+    def __init__(self, application_store, interval: float = 300.0, chunk_size: int = 50,
+                 api_budget: int = 20, repair: bool = False):
+        self.application_store = application_store
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.api_budget = api_budget
+        self.repair = repair
+        self._task: Optional[asyncio.Task] = None
+        self._offset = 0
+        
+        # 上一轮完整扫描的偏差
+        self.drift: Dict[int, Dict[str, int]] = {}
+        
+        # 统计数据
+        self.checked = 0
+        self.repaired = 0
+        self.api_calls = 0
+        self.passes = 0
+    
+    def start(self, bot):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(bot))
+            mode = '自动修复' if self.repair else '只统计'
+            logger.info(f"身份组核对已启动（{mode}），间隔 {self.interval} 秒，每块 {self.chunk_size} 条，每轮 API 预算 {self.api_budget}")
+    
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _loop(self, bot):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once(bot)
+            except Exception as e:
+                logger.error(f"身份组核对失败: {e}")
+    
+    def _cursor_key(self, guild_id: int) -> str:
+        return f'reconcile_cursor:{guild_id}'
+    
+    def _load_progress(self, guild_id: int) -> Tuple[int, Dict[str, int]]:
+        """读取扫描进度 (游标, 当前扫描中累计的偏差)
+        
+        旧版本只保存了游标，缺少偏差时从头扫描，避免把部分记录的偏差当作完整结果。
+        """
+        counts = dict.fromkeys(DRIFT_KINDS, 0)
+        try:
+            progress = json.loads(self.application_store.get_meta(self._cursor_key(guild_id)) or '{}')
+            saved = progress['counts']
+            for kind in DRIFT_KINDS:
+                counts[kind] = int(saved.get(kind, 0))
+            return int(progress['cursor']), counts
+        except (ValueError, TypeError, KeyError, AttributeError):
+            return 0, dict.fromkeys(DRIFT_KINDS, 0)
+    
+    def _save_progress(self, guild_id: int, cursor: int, counts: Dict[str, int]):
+        self.application_store.set_meta(self._cursor_key(guild_id), json.dumps({'cursor': cursor, 'counts': counts}))
+    
+    async def run_once(self, bot) -> int:
+        """每个服务器核对一块记录，返回本轮使用的 API 调用次数"""
+        guilds = bot.guilds
+        if not guilds:
+            return 0
+        # 每轮从不同的服务器开始，预算不足时各服务器轮流推进
+        self._offset = (self._offset + 1) % len(guilds)
+        budget = self.api_budget
+        for guild in guilds[self._offset:] + guilds[:self._offset]:
+            if budget <= 0:
+                break
+            budget -= await self._check_chunk(bot, guild, budget)
+        return self.api_budget - budget
+    
+    async def _check_chunk(self, bot, guild: discord.Guild, budget: int) -> int:
+        """核对服务器的下一块记录，返回使用的 API 调用次数"""
+        verified_role_id = bot.config_manager.get_verified_role_id(guild.id)
+        role = guild.get_role(verified_role_id) if verified_role_id else None
+        if not role:
+            return 0
+        
+        cursor, counts = self._load_progress(guild.id)
+        applications = self.application_store.list_approved_after(guild.id, cursor, self.chunk_size)
+        used = 0
+        stopped = False
+        
+        for application in applications:
+            user_id = application['user_id']
+            member = guild.get_member(user_id) or bot.member_cache.get(guild.id, user_id)
+            if member is None:
+                if used >= budget:
+                    stopped = True
+                    break
+                used += 1
+                self.api_calls += 1
+                try:
+                    member = await bot.job_queue.submit('fetch_member', lambda: guild.fetch_member(user_id),
+                                                        priority=PRIORITY_BACKGROUND, guild_id=guild.id)
+                    bot.member_cache.remember(member)
+                except discord.NotFound:
+                    counts['left'] += 1
+                except discord.HTTPException as e:
+                    logger.warning(f"核对时获取成员 {user_id} 失败: {e}")
+                    stopped = True
+                    break
+            
+            if member is not None and role not in member.roles:
+                counts['missing_role'] += 1
+                if self.repair and used < budget:
+                    used += 1
+                    self.api_calls += 1
+                    try:
+                        await bot.job_queue.submit('add_roles', lambda: member.add_roles(role, reason='身份组核对'),
+                                                   priority=PRIORITY_BACKGROUND, guild_id=guild.id)
+                        self.repaired += 1
+                        logger.info(f"核对: 已为用户 {member} 补发身份组 {role.name}", extra={'guild_id': guild.id, 'user_id': user_id})
+                    except discord.HTTPException as e:
+                        logger.warning(f"核对: 为用户 {member} 补发身份组失败: {e}")
+            
+            self.checked += 1
+            cursor = application['id']
+        
+        if stopped or len(applications) == self.chunk_size:
+            self._save_progress(guild.id, cursor, counts)
+        else:
+            self._finish_pass(guild, role, counts)
+        return used
+    
+    def _finish_pass(self, guild: discord.Guild, role: discord.Role, counts: Dict[str, int]):
+        """一个服务器的全部记录扫描完毕：记录偏差并重置游标"""
+        # 持有身份组但没有通过记录的成员（只在成员列表完整时统计，不消耗 API）
+        if guild.chunked:
+            approved = self.application_store.approved_user_ids(guild.id)
+            counts['unexpected_role'] = sum(1 for member in role.members if member.id not in approved and not member.bot)
+        
+        self.drift[guild.id] = counts
+        self.passes += 1
+        self._save_progress(guild.id, 0, dict.fromkeys(DRIFT_KINDS, 0))
+        if any(counts.values()):
+            logger.warning(
+                f"核对完成: 服务器 {guild.name} 缺少身份组 {counts['missing_role']} 人、已离开 {counts['left']} 人、"
+                f"无通过记录但持有身份组 {counts['unexpected_role']} 人",
+                extra={'guild_id': guild.id}
+            )
+    
+    def stats(self) -> dict:
+        """核对统计：各类偏差为最近一次完整扫描的合计"""
+        totals = dict.fromkeys(DRIFT_KINDS, 0)
+        for counts in self.drift.values():
+            for kind in DRIFT_KINDS:
+                totals[kind] += counts[kind]
+        return {
+            'checked': self.checked,
+            'repaired': self.repaired,
+            'api_calls': self.api_calls,
+            'passes': self.passes,
+            'guilds': len(self.drift),
+            **totals,
+        }
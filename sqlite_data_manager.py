@@ -0,0 +1,184 @@
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, Any
+from data_manager import DataManager
+from logger import get_logger
+
+logger = get_logger('sqlite')
+
+class SQLiteDataManager(DataManager):
+    """SQLite 存储后端：每个服务器一行，写入只影响对应的行"""
+    
+    # 其他进程的修改通过 data_version 同步，无需监视文件
+    reloadable = False
+    
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS guild_config (
+        guild_id INTEGER PRIMARY KEY,
+        config TEXT NOT NULL,
+        updated_at TEXT
+    );
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """
+    
+    # 固定 SQL 文本，由 sqlite3 的语句缓存复用预编译语句
+    SQL_SELECT_ALL = 'SELECT guild_id, config FROM guild_config'
+    SQL_UPSERT = (
+        'INSERT INTO guild_config (guild_id, config, updated_at) VALUES (?, ?, ?) '
+        'ON CONFLICT(guild_id) DO UPDATE SET config = excluded.config, updated_at = excluded.updated_at'
+    )
+    SQL_INSERT_IGNORE = 'INSERT OR IGNORE INTO guild_config (guild_id, config, updated_at) VALUES (?, ?, ?)'
+    SQL_DELETE = 'DELETE FROM guild_config WHERE guild_id = ?'
+    SQL_GET_META = 'SELECT value FROM meta WHERE key = ?'
+    SQL_SET_META = 'INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value'
+    # 服务器配置的版本号，只有 guild_config 的写入会递增（同一数据库中的申请记录写入不影响）
+    SQL_BUMP_VERSION = (
+        "INSERT INTO meta (key, value) VALUES ('config_version', '1') "
+        "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+    )
+    SQL_GET_VERSION = "SELECT CAST(value AS INTEGER) FROM meta WHERE key = 'config_version'"
+    
+    def __init__(self, db_path: str = 'verification.db', json_file: str = 'server_data.json'):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, cached_statements=64)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(self.SCHEMA)
+        
+        self.migrate_from_json(json_file)
+        self._data_version = self._read_data_version()
+        self._config_version = self._read_config_version()
+        super().__init__(data_file=json_file)
+    
+    def load_data(self) -> Dict[str, Any]:
+        """从数据库加载全部服务器配置到内存"""
+        data = {}
+        for guild_id, config in self.conn.execute(self.SQL_SELECT_ALL):
+            try:
+                data[str(guild_id)] = json.loads(config)
+            except json.JSONDecodeError:
+                logger.error(f"服务器 {guild_id} 的配置数据损坏，已跳过")
+        return data
+    
+    def _read_data_version(self) -> int:
+        return self.conn.execute('PRAGMA data_version').fetchone()[0]
+    
+    def _read_config_version(self) -> int:
+        row = self.conn.execute(self.SQL_GET_VERSION).fetchone()
+        return row[0] if row else 0
+    
+    def _sync_external_changes(self):
+        """其他进程修改服务器配置后重新加载，保证多进程间配置一致
+        
+        data_version 在任何其他连接提交后都会变化（包括共用数据库的申请记录），
+        只作为廉价的预检查；配置版本号变化时才重新加载。
+        """
+        version = self._read_data_version()
+        if version == self._data_version:
+            return
+        self._data_version = version
+        config_version = self._read_config_version()
+        if config_version != self._config_version:
+            self._config_version = config_version
+            self.data = self.load_data()
+            self.rebuild_snapshots()
+    
+    def _write(self, sql: str, params: tuple):
+        """写入服务器配置并递增配置版本号"""
+        with self.conn:
+            self.conn.execute(sql, params)
+            self.conn.execute(self.SQL_BUMP_VERSION)
+            version = self._read_config_version()
+        # 期间没有其他进程的修改时，内存中的数据已是最新
+        if version == self._config_version + 1:
+            self._config_version = version
+    
+    def get_server_config(self, guild_id: int) -> Dict[str, Any]:
+        """获取服务器配置"""
+        self._sync_external_changes()
+        return super().get_server_config(guild_id)
+    
+    def get_snapshot(self, guild_id: int):
+        """获取服务器配置快照"""
+        self._sync_external_changes()
+        return super().get_snapshot(guild_id)
+    
+    def migrate_from_json(self, json_file: str) -> int:
+        """一次性将旧的 JSON 数据批量导入数据库"""
+        row = self.conn.execute(self.SQL_GET_META, ('json_migrated_at',)).fetchone()
+        if row or not os.path.exists(json_file):
+            return 0
+        
+        try:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.error(f"读取旧数据文件 {json_file} 失败，跳过迁移: {e}")
+            return 0
+        
+        now = datetime.now().isoformat()
+        rows = []
+        for guild_key, config in legacy.items():
+            try:
+                guild_id = int(guild_key)
+            except (TypeError, ValueError):
+                logger.error(f"旧数据文件中的服务器ID {guild_key!r} 无效，已跳过")
+                continue
+            if not isinstance(config, dict):
+                logger.error(f"旧数据文件中服务器 {guild_key} 的配置格式错误，已跳过")
+                continue
+            rows.append((guild_id, json.dumps(config, ensure_ascii=False), config.get('updated_at', now)))
+        with self.conn:
+            self.conn.executemany(self.SQL_INSERT_IGNORE, rows)
+            self.conn.execute(self.SQL_SET_META, ('json_migrated_at', now))
+            self.conn.execute(self.SQL_BUMP_VERSION)
+        
+        logger.info(f"已从 {json_file} 迁移 {len(rows)} 个服务器配置到 {self.db_path}")
+        return len(rows)
+    
+    def save_data(self) -> bool:
+        """每次修改都已直接写入数据库，无需整体保存"""
+        return True
+    
+    async def flush(self) -> bool:
+        return True
+    
+    def start(self):
+        pass
+    
+    async def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
+    
+    def set_server_config(self, guild_id: int, config: Dict[str, Any]) -> bool:
+        """设置服务器配置（只写入该服务器对应的行）"""
+        guild_key = str(guild_id)
+        merged = dict(self.data.get(guild_key, {}))
+        merged.update(config)
+        merged['updated_at'] = datetime.now().isoformat()
+        
+        try:
+            self._write(self.SQL_UPSERT, (int(guild_id), json.dumps(merged, ensure_ascii=False), merged['updated_at']))
+        except sqlite3.Error as e:
+            logger.error(f"保存数据失败: {e}")
+            return False
+        
+        self.data[guild_key] = merged
+        return True
+    
+    def delete_server_config(self, guild_id: int) -> bool:
+        """删除服务器配置"""
+        try:
+            self._write(self.SQL_DELETE, (int(guild_id),))
+        except sqlite3.Error as e:
+            logger.error(f"删除数据失败: {e}")
+            return False
+        
+        self.data.pop(str(guild_id), None)
+        self._refresh_snapshot(guild_id)
+        return True
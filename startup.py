@@ -0,0 +1,42 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+class StartupProfile:
+    """记录启动各阶段的耗时，在首次就绪时输出启动报告
+    
+    阶段按开始顺序排列；并发执行的阶段各自计时，因此各阶段之和可能大于总耗时。
+    """
+    
+    def __init__(self, started: Optional[float] = None):
+        self.started = started if started is not None else time.perf_counter()
+        self.phases: Dict[str, Optional[float]] = {}
+    
+    def begin(self, name: str):
+        """标记阶段开始（用于跨越多个回调的阶段）"""
+        self.phases.setdefault(name, None)
+    
+    def record(self, name: str, seconds: float):
+        self.phases[name] = seconds
+    
+    @contextmanager
+    def phase(self, name: str):
+        """为一段代码计时"""
+        self.begin(name)
+        stage = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - stage)
+    
+    def elapsed(self) -> float:
+        """自进程启动以来的时间"""
+        return time.perf_counter() - self.started
+    
+    def report(self) -> str:
+        """各阶段耗时，尚未完成的阶段标记为进行中"""
+        parts = [
+            f'{name} {seconds * 1000:.0f}ms' if seconds is not None else f'{name} 进行中'
+            for name, seconds in self.phases.items()
+        ]
+        return '，'.join(parts)
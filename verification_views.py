@@ -1,10 +1,220 @@
+import asyncio
+import time
 import discord
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
+from job_queue import PRIORITY_ROLE, PRIORITY_DM
+from metrics import instrument, registry as metrics_registry
 from logger import get_logger
 
 logger = get_logger('views')
 
+# 后台任务的强引用，避免任务在完成前被回收
+_background_tasks = set()
+
+def spawn_background(coro) -> asyncio.Task:
+    """在后台运行协程"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+# 进程内的审核认领：申请ID → 审核者ID，重复点击无需访问存储即可拒绝
+_claims: Dict[int, int] = {}
+
+def claim_application(store, application_id: int, reviewer_id: int) -> Optional[int]:
+    """认领申请，保证每个申请只被处理一次
+    
+    先检查进程内的认领表，再在存储中以 status='pending' 为条件更新（多进程共享数据库时同样有效）。
+    认领成功返回 None，否则返回已认领的审核者ID（未知时为 0）。
+    """
+    holder = _claims.get(application_id)
+    if holder is not None:
+        return holder
+    _claims[application_id] = reviewer_id
+    if store.claim(application_id, reviewer_id):
+        return None
+    del _claims[application_id]
+    current = store.get(application_id)
+    return (current or {}).get('reviewer_id') or 0
+
+def finish_claim(store, application_id: int, decided: bool):
+    """结束认领；未做出决定时释放，申请重新变为待审核"""
+    _claims.pop(application_id, None)
+    if not decided:
+        store.release(application_id)
+
+def already_handled_message(holder: int) -> str:
+    return f'该申请已由 <@{holder}> 处理！' if holder else '该申请已被处理！'
+
+def build_decision_embed(approved: bool, applicant: str, reason: Optional[str], reviewer: str,
+                         role_name: Optional[str] = None) -> discord.Embed:
+    """构建审核结果卡片"""
+    embed = discord.Embed(
+        title='✅ 验证申请已通过' if approved else '❌ 验证申请已拒绝',
+        description=f'申请者: {applicant}',
+        color=discord.Color.green() if approved else discord.Color.red(),
+        timestamp=datetime.now()
+    )
+    if reason:
+        embed.add_field(name='申请原因', value=reason, inline=False)
+    embed.add_field(name='审核者', value=reviewer, inline=True)
+    if role_name:
+        embed.add_field(name='分配身份组', value=role_name, inline=True)
+    return embed
+
+def build_approval_dm_embed(guild: discord.Guild, role_name: str) -> discord.Embed:
+    """构建审核通过的私信通知"""
+    embed = discord.Embed(
+        title='🎉 验证通过！',
+        description=f'恭喜！你在 **{guild.name}** 的验证申请已通过！',
+        color=discord.Color.green(),
+        timestamp=datetime.now()
+    )
+    embed.add_field(name='获得身份组', value=role_name, inline=False)
+    return embed
+
+def build_review_embed(application: dict, user=None) -> discord.Embed:
+    """根据申请记录构建审核卡片"""
+    embed = discord.Embed(
+        title='🔍 新的验证申请',
+        color=discord.Color.blue(),
+        timestamp=datetime.fromtimestamp(application['created_at'])
+    )
+    user_id = application['user_id']
+    applicant = f'{user.mention}\n`{user} (ID: {user_id})`' if user else f'<@{user_id}>\n`ID: {user_id}`'
+    embed.add_field(name='申请者', value=applicant, inline=False)
+    embed.add_field(name='申请原因', value=application['reason'], inline=False)
+    
+    created_at = application['account_created_at']
+    joined_at = application['joined_at']
+    created_text = datetime.fromtimestamp(created_at).strftime("%Y-%m-%d %H:%M:%S") if created_at else '未知'
+    joined_text = datetime.fromtimestamp(joined_at).strftime("%Y-%m-%d %H:%M:%S") if joined_at else '未知'
+    embed.add_field(name='账号信息', value=f'创建时间: {created_text}\n加入时间: {joined_text}', inline=False)
+    return embed
+
+async def post_review_card(config_manager, review_channel, application: dict, user=None):
+    """发送审核卡片并记录消息ID"""
+    embed = build_review_embed(application, user)
+    message = await review_channel.send(embed=embed, view=ReviewView(application['user_id']))
+    if not config_manager.application_store.set_message(application['id'], review_channel.id, message.id):
+        # 发送期间申请已被处理或过期，卡片不再接受审核
+        logger.info(f"申请 {application['id']} 在发送审核卡片期间已被处理", extra={'guild_id': review_channel.guild.id})
+        await message.edit(content=already_handled_message(0), view=None)
+    return message
+
+async def reply(interaction: discord.Interaction, message: str):
+    """发送仅自己可见的回复；交互已确认时改用 followup"""
+    if interaction.response.is_done():
+        await interaction.followup.send(message, ephemeral=True)
+    else:
+        await interaction.response.send_message(message, ephemeral=True)
+
+class ApprovalResult:
+    """approve_application 的结果；error 不为空表示失败"""
+    __slots__ = ('member', 'role', 'added', 'removed', 'error', 'dm_task')
+    
+    def __init__(self):
+        self.member = None
+        self.role = None
+        self.added: list = []
+        self.removed: list = []
+        self.error: Optional[str] = None
+        self.dm_task: Optional[asyncio.Task] = None
+    
+    @property
+    def role_names(self) -> str:
+        """获得的身份组名称"""
+        return ', '.join(role.name for role in self.added) or (self.role.name if self.role else '')
+
+def compute_outcome_roles(member, add_roles: list, remove_ids: tuple) -> tuple:
+    """根据成员当前的身份组计算审核通过后的完整身份组列表
+    
+    返回 (新的身份组列表, 新增的身份组, 移除的身份组)；没有变化时新列表为 None。
+    """
+    current = [role for role in member.roles if not role.is_default()]
+    current_ids = {role.id for role in current}
+    removed = [role for role in current if role.id in remove_ids]
+    added = [role for role in add_roles if role.id not in current_ids]
+    if not added and not removed:
+        return None, added, removed
+    roles = [role for role in current if role.id not in remove_ids] + added
+    return roles, added, removed
+
+async def send_approval_dm(job_queue, user, guild: discord.Guild, role_name: str, timings: Optional[dict] = None):
+    """发送审核通过的私信通知，失败只记录日志"""
+    stage = time.perf_counter()
+    try:
+        embed = build_approval_dm_embed(guild, role_name)
+        await job_queue.submit('dm', lambda: user.send(embed=embed), priority=PRIORITY_DM, guild_id=guild.id)
+        logger.info(f"已向用户 {user} 发送通过通知私信")
+    except discord.Forbidden:
+        logger.warning(f"无法向用户 {user} 发送私信，可能关闭了私信功能")
+    except discord.HTTPException as e:
+        logger.warning(f"向用户 {user} 发送私信失败: {e}")
+    if timings is not None:
+        timings['dm'] = time.perf_counter() - stage
+
+async def approve_application(bot, guild: discord.Guild, user_id: int, application_id: Optional[int],
+                              reviewer_id: int, timings: Optional[dict] = None) -> ApprovalResult:
+    """通过申请：获取成员、分配验证身份组并更新记录，私信在后台发送
+    
+    审核按钮、批量审核和汇总消息共用此流程。
+    """
+    timings = timings if timings is not None else {}
+    result = ApprovalResult()
+    
+    verified_role_id = bot.config_manager.get_verified_role_id(guild.id)
+    result.role = guild.get_role(verified_role_id) if verified_role_id else None
+    if not result.role:
+        result.error = '❌ 验证身份组未设置或不存在！'
+        return result
+    add_ids, remove_ids = bot.config_manager.get_outcome_roles(guild.id)
+    # 已被删除的额外身份组直接忽略
+    add_roles = [role for role in (guild.get_role(role_id) for role_id in add_ids) if role]
+    
+    # 依次从成员缓存和 API 获取用户
+    stage = time.perf_counter()
+    try:
+        result.member = await bot.member_cache.resolve(guild, user_id, bot.job_queue)
+    except discord.NotFound:
+        logger.warning(f"用户 {user_id} 已离开服务器")
+        result.error = f'❌ 用户 <@{user_id}> 已离开服务器！'
+        return result
+    except Exception as e:
+        logger.error(f"获取用户失败: {e}")
+        result.error = f'❌ 无法获取用户信息 (ID: {user_id})！'
+        return result
+    timings['fetch_member'] = time.perf_counter() - stage
+    
+    # 按成员当前身份组算出结果，添加和移除合并为一次成员编辑请求（经出站队列限速与重试）
+    stage = time.perf_counter()
+    member = result.member
+    roles, result.added, result.removed = compute_outcome_roles(member, add_roles, remove_ids)
+    if roles is not None:
+        try:
+            await bot.job_queue.submit('edit_member', lambda: member.edit(roles=roles, reason='验证申请通过'),
+                                       priority=PRIORITY_ROLE, guild_id=guild.id)
+            logger.info(
+                f"成功更新用户 {member} 的身份组: 添加 {[role.name for role in result.added]}，"
+                f"移除 {[role.name for role in result.removed]}"
+            )
+        except discord.Forbidden:
+            logger.error(f"机器人没有权限修改用户 {member} 的身份组")
+            result.error = '❌ 机器人没有权限分配该身份组！'
+            return result
+        except discord.HTTPException as e:
+            logger.error(f"分配身份组失败: {e}")
+            result.error = f'❌ 分配身份组失败: {e}'
+            return result
+    timings['edit_roles'] = time.perf_counter() - stage
+    
+    if application_id:
+        bot.config_manager.application_store.set_status(application_id, 'approved', reviewer_id)
+    
+    result.dm_task = spawn_background(send_approval_dm(bot.job_queue, member, guild, result.role_names, timings))
+    return result
+
 class VerificationView(discord.ui.View):
     def __init__(self, config_manager, bot):
         super().__init__(timeout=None)
@@ -13,6 +223,7 @@ class VerificationView(discord.ui.View):
         # 延迟初始化，避免在启动时阻塞
     
     @discord.ui.button(label='申请验证', style=discord.ButtonStyle.primary, emoji='✅', custom_id='verification:apply')
+    @instrument('verify_button')
     async def verify_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         # 检查用户是否已经有验证角色
         verified_role_id = self.config_manager.get_verified_role_id(interaction.guild.id)
@@ -22,6 +233,15 @@ class VerificationView(discord.ui.View):
                 await interaction.response.send_message('你已经通过验证了！', ephemeral=True)
                 return
         
+        # 已有未处理的申请时不再显示表单
+        decision, detail = self.bot.admission.check(interaction.guild.id, interaction.user.id)
+        if decision == 'duplicate':
+            await interaction.response.send_message('你已有一个待审核的申请，请耐心等待！', ephemeral=True)
+            return
+        if decision == 'cooldown':
+            await interaction.response.send_message(f'提交过于频繁，请在 {int(detail // 60) + 1} 分钟后再试！', ephemeral=True)
+            return
+        
         # 显示申请表单
         modal = VerificationModal(self.config_manager, self.bot)
         await interaction.response.send_modal(modal)
@@ -41,7 +261,11 @@ class VerificationModal(discord.ui.Modal):
         )
         self.add_item(self.reason)
     
+    @instrument('VerificationModal.on_submit')
     async def on_submit(self, interaction: discord.Interaction):
+        # 记住申请者，审核时无需再通过 API 获取
+        self.bot.member_cache.remember(interaction.user)
+        
         # 发送到审核频道
         review_channel_id = self.config_manager.get_review_channel_id(interaction.guild.id)
         if not review_channel_id:
@@ -53,149 +277,241 @@ class VerificationModal(discord.ui.Modal):
             await interaction.response.send_message('审核频道不存在，请联系管理员！', ephemeral=True)
             return
         
-        # 创建审核卡片
-        embed = discord.Embed(
-            title='🔍 新的验证申请',
-            color=discord.Color.blue(),
-            timestamp=datetime.now()
+        # 准入检查：重复申请、冷却时间和服务器每分钟上限
+        admission = self.bot.admission
+        decision, detail = admission.check(interaction.guild.id, interaction.user.id)
+        if decision == 'duplicate':
+            await interaction.response.send_message('你已有一个待审核的申请，请耐心等待！', ephemeral=True)
+            return
+        if decision == 'cooldown':
+            await interaction.response.send_message(f'提交过于频繁，请在 {int(detail // 60) + 1} 分钟后再试！', ephemeral=True)
+            return
+        
+        # 自动通过：符合服务器规则的申请直接分配身份组，不经过人工审核
+        auto_approve = False
+        rules = self.config_manager.get_auto_rules(interaction.guild.id)
+        if rules.enabled:
+            account_age_days = (discord.utils.utcnow() - interaction.user.created_at).total_seconds() / 86400
+            auto_approve, why = rules.check(self.reason.value, account_age_days)
+            logger.info(f"自动通过规则: 用户 {interaction.user} {'符合' if auto_approve else '不符合'}（{why}）",
+                        extra={'guild_id': interaction.guild.id, 'user_id': interaction.user.id, 'sample': True})
+        
+        # 汇总模式：只保存申请，由汇总任务定期合并发送，无需按分钟限流
+        review_mode, _ = self.config_manager.get_review_mode(interaction.guild.id)
+        if review_mode == 'digest':
+            decision = 'accept'
+        
+        # 先保存申请记录，避免同一用户并发提交时重复创建；自动通过的申请先以待审核状态创建以便认领
+        application_id = self.config_manager.application_store.create(
+            guild_id=interaction.guild.id,
+            user_id=interaction.user.id,
+            reason=self.reason.value,
+            account_created_at=interaction.user.created_at.timestamp(),
+            joined_at=interaction.user.joined_at.timestamp() if interaction.user.joined_at else None,
+            status='queued' if decision == 'queue' and not auto_approve else 'pending'
         )
-        embed.add_field(name='申请者', value=f'{interaction.user.mention}\n`{interaction.user} (ID: {interaction.user.id})`', inline=False)
-        embed.add_field(name='申请原因', value=self.reason.value, inline=False)
-        embed.add_field(name='账号信息', value=f'创建时间: {interaction.user.created_at.strftime("%Y-%m-%d %H:%M:%S")}\n加入时间: {interaction.user.joined_at.strftime("%Y-%m-%d %H:%M:%S")}', inline=False)
         
-        # 创建审核按钮
-        view = ReviewView(self.config_manager, self.bot, interaction.user.id)
-        await review_channel.send(embed=embed, view=view)
+        if auto_approve:
+            # 在任何等待之前认领，避免汇总、批量审核或过期检查在身份组分配期间重复处理
+            store = self.config_manager.application_store
+            claimed = claim_application(store, application_id, self.bot.user.id) is None
+            result = None
+            try:
+                # 分配身份组要经过出站队列，先确认交互
+                await interaction.response.defer(ephemeral=True, thinking=True)
+                result = await approve_application(self.bot, interaction.guild, interaction.user.id, application_id, self.bot.user.id)
+            finally:
+                # 失败时释放认领，申请回到待审核，转为人工审核
+                if claimed:
+                    finish_claim(store, application_id, decided=result is not None and not result.error)
+            if not result.error:
+                logger.info(f"自动通过: 用户 {interaction.user} 已获得身份组 {result.role_names}",
+                            extra={'guild_id': interaction.guild.id, 'user_id': interaction.user.id})
+                await interaction.followup.send(f'🎉 你的申请已自动通过，获得身份组 **{result.role_names}**！', ephemeral=True)
+                return
+            logger.warning(f"自动通过失败，转为人工审核: {result.error}",
+                           extra={'guild_id': interaction.guild.id, 'user_id': interaction.user.id})
+            # 转为人工审核时仍受每分钟上限约束，超过上限的重新排队
+            if decision == 'queue':
+                store.requeue(application_id)
+        
+        if decision == 'queue':
+            position = admission.queue_position(interaction.guild.id, application_id)
+            logger.info(f"申请排队: 用户 {interaction.user} 的申请排在第 {position} 位",
+                        extra={'guild_id': interaction.guild.id, 'user_id': interaction.user.id})
+            await reply(interaction, f'⏳ 当前申请人数较多，你的申请已进入队列（第 {position} 位），稍后会自动提交给管理员审核。')
+            return
+        
+        if review_mode == 'digest':
+            logger.info(f"新申请: 用户 {interaction.user} 提交验证申请（汇总模式）",
+                        extra={'guild_id': interaction.guild.id, 'user_id': interaction.user.id, 'sample': True})
+            await reply(interaction, '✅ 你的申请已提交，请耐心等待管理员审核！')
+            return
+        
+        # 创建审核卡片，审核按钮重启后通过消息ID找回申请记录
+        admission.record_post(interaction.guild.id)
+        application = self.config_manager.application_store.get(application_id)
+        try:
+            await post_review_card(self.config_manager, review_channel, application, interaction.user)
+        except discord.HTTPException as e:
+            logger.error(f"发送审核卡片失败: {e}")
+            self.config_manager.application_store.set_status(application_id, 'failed')
+            await reply(interaction, '❌ 提交申请失败，请稍后重试！')
+            return
         
-        logger.info(f"新申请: 用户 {interaction.user} 提交验证申请")
+        logger.info(f"新申请: 用户 {interaction.user} 提交验证申请",
+                    extra={'guild_id': interaction.guild.id, 'user_id': interaction.user.id, 'sample': True})
         
-        await interaction.response.send_message('✅ 你的申请已提交，请耐心等待管理员审核！', ephemeral=True)
+        await reply(interaction, '✅ 你的申请已提交，请耐心等待管理员审核！')
 
 class ReviewView(discord.ui.View):
-    def __init__(self, config_manager, bot, user_id: int):
-        super().__init__(timeout=None)  # 无超时，持久化
-        self.config_manager = config_manager
-        self.bot = bot
+    """审核卡片视图，仅在发送卡片时使用；点击由 ReviewButton 统一处理，不在内存中保留"""
+    def __init__(self, user_id: int):
+        super().__init__(timeout=None)
+        self.add_item(ReviewButton('approve', user_id))
+        self.add_item(ReviewButton('reject', user_id))
+
+class ReviewButton(discord.ui.DynamicItem[discord.ui.Button], template=r'review:(?P<action>approve|reject):(?P<user_id>[0-9]+)'):
+    """审核按钮，custom_id 中带有操作类型和申请者ID，机器人重启后依然可用"""
+    def __init__(self, action: str, user_id: int):
+        if action == 'approve':
+            button = discord.ui.Button(label='通过', style=discord.ButtonStyle.success, emoji='✅', custom_id=f'review:approve:{user_id}')
+        else:
+            button = discord.ui.Button(label='拒绝', style=discord.ButtonStyle.danger, emoji='❌', custom_id=f'review:reject:{user_id}')
+        super().__init__(button)
+        self.action = action
         self.user_id = user_id
     
-    @discord.ui.button(label='通过', style=discord.ButtonStyle.success, emoji='✅')
-    async def approve_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if not self.check_permissions(interaction):
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match['action'], int(match['user_id']))
+    
+    async def callback(self, interaction: discord.Interaction):
+        config_manager = interaction.client.config_manager
+        if not self.check_permissions(interaction, config_manager):
             await interaction.response.send_message('❌ 你没有权限执行此操作！', ephemeral=True)
             return
         
-        # 获取用户和角色
-        guild = interaction.guild
-        logger.info(f"审核通过: 尝试获取用户 {self.user_id}")
-        
-        # 首先尝试从服务器成员中获取
-        user = guild.get_member(self.user_id)
-        
-        if not user:
-            # 尝试刷新服务器成员缓存
-            try:
-                user = await guild.fetch_member(self.user_id)
-                logger.info(f"通过API获取到用户: {user}")
-            except discord.NotFound:
-                logger.warning(f"用户 {self.user_id} 已离开服务器")
-                await interaction.response.send_message(f'❌ 用户 <@{self.user_id}> 已离开服务器！', ephemeral=True)
-                return
-            except Exception as e:
-                logger.error(f"获取用户失败: {e}")
-                await interaction.response.send_message(f'❌ 无法获取用户信息 (ID: {self.user_id})！', ephemeral=True)
+        # 通过消息ID找到申请记录，并在任何 API 调用之前认领
+        store = config_manager.application_store
+        application = store.get_by_message(interaction.message.id)
+        if application:
+            holder = claim_application(store, application['id'], interaction.user.id)
+            if holder is not None:
+                await interaction.response.send_message(already_handled_message(holder), ephemeral=True)
                 return
         
-        verified_role_id = self.config_manager.get_verified_role_id(guild.id)
+        try:
+            if self.action == 'approve':
+                decided = await self.approve_button(interaction, config_manager, application)
+            else:
+                decided = await self.reject_button(interaction, config_manager, application)
+        except BaseException:
+            if application:
+                finish_claim(store, application['id'], decided=False)
+            raise
+        # 审核通过在后台完成，由 _complete_approval 结束认领
+        if application and decided is not None:
+            finish_claim(store, application['id'], decided)
+    
+    @instrument('approve_button')
+    async def approve_button(self, interaction: discord.Interaction, config_manager, application: Optional[dict]):
+        start = time.perf_counter()
+        guild = interaction.guild
+        
+        # 先检查本地配置，不涉及 API 调用
+        verified_role_id = config_manager.get_verified_role_id(guild.id)
         if not verified_role_id:
             await interaction.response.send_message('❌ 管理员尚未设置验证身份组！', ephemeral=True)
-            return
+            return False
         
         verified_role = guild.get_role(verified_role_id)
         if not verified_role:
             await interaction.response.send_message('❌ 验证身份组不存在！', ephemeral=True)
-            return
+            return False
         
-        # 分配角色
-        try:
-            await user.add_roles(verified_role)
-            logger.info(f"成功为用户 {user} 分配身份组 {verified_role.name}")
-            
-            # 发送私信通知
-            try:
-                embed = discord.Embed(
-                    title='🎉 验证通过！',
-                    description=f'恭喜！你在 **{guild.name}** 的验证申请已通过！',
-                    color=discord.Color.green(),
-                    timestamp=datetime.now()
-                )
-                embed.add_field(name='获得身份组', value=verified_role.name, inline=False)
-                await user.send(embed=embed)
-                logger.info(f"已向用户 {user} 发送通过通知私信")
-            except discord.Forbidden:
-                logger.warning(f"无法向用户 {user} 发送私信，可能关闭了私信功能")
-            
-            # 获取原始申请原因
-            original_embed = interaction.message.embeds[0]
-            application_reason = None
-            for field in original_embed.fields:
-                if field.name == '申请原因':
-                    application_reason = field.value
-                    break
-            
-            # 更新审核消息
-            embed = discord.Embed(
-                title='✅ 验证申请已通过',
-                description=f'申请者: {user.mention}',
-                color=discord.Color.green(),
-                timestamp=datetime.now()
-            )
-            if application_reason:
-                embed.add_field(name='申请原因', value=application_reason, inline=False)
-            embed.add_field(name='审核者', value=interaction.user.mention, inline=True)
-            embed.add_field(name='分配身份组', value=verified_role.name, inline=True)
-            
-            self.clear_items()
-            await interaction.response.edit_message(embed=embed, view=self)
-            
-        except discord.Forbidden:
-            logger.error(f"机器人没有权限分配身份组 {verified_role.name}")
-            await interaction.response.send_message('❌ 机器人没有权限分配该身份组！', ephemeral=True)
+        # 立即确认交互：把卡片改为处理中并移除按钮，避免超过 3 秒时限和重复点击
+        original_embed = interaction.message.embeds[0] if interaction.message.embeds else None
+        processing_embed = discord.Embed(
+            title='⏳ 正在处理验证申请',
+            description=f'申请者: <@{self.user_id}>',
+            color=discord.Color.orange()
+        )
+        processing_embed.add_field(name='审核者', value=interaction.user.mention, inline=True)
+        await interaction.response.edit_message(embed=processing_embed, view=None)
+        timings = {'ack': time.perf_counter() - start}
+        
+        # 分配身份组和私信在后台完成，结束后再编辑卡片
+        spawn_background(self._complete_approval(interaction, config_manager, application, verified_role, original_embed, start, timings))
+        return None
     
-    @discord.ui.button(label='拒绝', style=discord.ButtonStyle.danger, emoji='❌')
-    async def reject_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if not self.check_permissions(interaction):
-            await interaction.response.send_message('❌ 你没有权限执行此操作！', ephemeral=True)
+    async def _complete_approval(self, interaction: discord.Interaction, config_manager, application: Optional[dict],
+                                 verified_role: discord.Role, original_embed: Optional[discord.Embed],
+                                 start: float, timings: dict):
+        """后台完成审核通过的耗时操作"""
+        guild = interaction.guild
+        logger.info(f"审核通过: 尝试获取用户 {self.user_id}", extra={'guild_id': guild.id, 'user_id': self.user_id, 'sample': True})
+        
+        application_id = application['id'] if application else None
+        result = None
+        try:
+            result = await approve_application(interaction.client, guild, self.user_id, application_id, interaction.user.id, timings)
+        except Exception as e:
+            # 后台任务的异常没有人等待，在这里记录，下面恢复卡片，避免卡在“处理中”
+            logger.error(f"审核通过处理出错: {e}", exc_info=True, extra={'guild_id': guild.id, 'user_id': self.user_id})
+        finally:
+            if application_id:
+                finish_claim(config_manager.application_store, application_id, decided=result is not None and not result.error)
+        if result is None:
+            await self._restore_card(interaction, original_embed, '❌ 处理申请时出错，请稍后重试！')
+            return
+        if result.error:
+            await self._restore_card(interaction, original_embed, result.error)
             return
         
+        # 更新审核消息（私信已在后台同时发送）
+        stage = time.perf_counter()
+        embed = build_decision_embed(True, result.member.mention, application['reason'] if application else None,
+                                     interaction.user.mention, result.role_names)
+        try:
+            await interaction.edit_original_response(embed=embed, view=None)
+        except discord.HTTPException as e:
+            logger.error(f"更新审核消息失败: {e}")
+        timings['edit'] = time.perf_counter() - stage
+        
+        await result.dm_task
+        timings['total'] = time.perf_counter() - start
+        metrics_registry.observe('approve_button.complete', guild.id, timings['total'])
+        stages = ' '.join(f'{name}={value * 1000:.1f}ms' for name, value in timings.items())
+        logger.info(f"审核耗时: 用户 {self.user_id} {stages}",
+                    extra={'guild_id': guild.id, 'user_id': self.user_id, 'latency_ms': round(timings['total'] * 1000, 1)})
+    
+    async def _restore_card(self, interaction: discord.Interaction, original_embed: Optional[discord.Embed], message: str):
+        """处理失败时恢复审核卡片并提示审核者"""
+        try:
+            await interaction.edit_original_response(embed=original_embed, view=ReviewView(self.user_id))
+            await interaction.followup.send(message, ephemeral=True)
+        except discord.HTTPException as e:
+            logger.error(f"恢复审核卡片失败: {e}")
+    
+    @instrument('reject_button')
+    async def reject_button(self, interaction: discord.Interaction, config_manager, application: Optional[dict]):
         # 直接拒绝，不发送私信
         guild = interaction.guild
-        user = guild.get_member(self.user_id)
+        user = guild.get_member(self.user_id) or interaction.client.member_cache.get(guild.id, self.user_id)
         
         logger.info(f"审核拒绝: 用户 {self.user_id} 的申请被 {interaction.user} 拒绝")
         
-        # 获取原始申请原因
-        original_embed = interaction.message.embeds[0]
-        application_reason = None
-        for field in original_embed.fields:
-            if field.name == '申请原因':
-                application_reason = field.value
-                break
+        if application:
+            config_manager.application_store.set_status(application['id'], 'rejected', interaction.user.id)
         
         # 更新审核消息
-        embed = discord.Embed(
-            title='❌ 验证申请已拒绝',
-            description=f'申请者: {user.mention if user else f"<@{self.user_id}>"}',
-            color=discord.Color.red(),
-            timestamp=datetime.now()
-        )
-        if application_reason:
-            embed.add_field(name='申请原因', value=application_reason, inline=False)
-        embed.add_field(name='审核者', value=interaction.user.mention, inline=True)
-        
+        embed = build_decision_embed(False, user.mention if user else f'<@{self.user_id}>',
+                                     application['reason'] if application else None, interaction.user.mention)
         await interaction.response.edit_message(embed=embed, view=None)
+        return True
     
-    def check_permissions(self, interaction):
+    def check_permissions(self, interaction, config_manager):
         """检查权限"""
         user_roles = [role.id for role in interaction.user.roles]
-        return self.config_manager.is_admin(user_roles, interaction.guild.id)
-
+        return config_manager.is_admin(user_roles, interaction.guild.id)